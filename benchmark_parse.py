@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark listing-page extraction: BeautifulSoup html.parser vs the lxml fast path,
+plus the single-pass price history extractor
+
+Usage:
+    python benchmark_parse.py [saved_page.html ...] [--iterations N]
+
+Save pages with e.g. `curl -o karambit.html "https://steamcommunity.com/market/listings/730/..."`.
+Without arguments a synthetic page shaped like a Steam listing page is used.
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import server
+
+def build_synthetic_page(history_points=3000, listings=20):
+    """Build a listing page with a realistic price history script and listing rows"""
+    start = datetime(2019, 1, 1)
+    history = []
+    for i in range(history_points):
+        date = start + timedelta(days=i) if i < history_points - 720 else start + timedelta(days=history_points - 720, hours=i)
+        history.append([date.strftime("%b %d %Y %H: +0"), round(random.uniform(10, 20), 3), str(random.randint(1, 500))])
+
+    rows = "".join(
+        f"""<div class="market_listing_row market_recent_listing_row" id="listing_{i}">
+            <div class="market_listing_price_listings_block">
+                <span class="market_listing_price market_listing_price_with_fee">${15 + i * 0.1:.2f}</span>
+                <span class="market_listing_price market_listing_price_with_publisher_fee_only">${14 + i * 0.1:.2f}</span>
+                <span class="market_listing_price market_listing_price_without_fee">${13 + i * 0.1:.2f}</span>
+            </div>
+            <div class="market_listing_item_name_block"><span class="market_listing_item_name">AK-47 | Redline (Field-Tested)</span>
+            <br><span class="market_listing_game_name">Counter-Strike 2</span></div>
+        </div>"""
+        for i in range(listings)
+    )
+    filler = "".join(f"<div class='nav_item'><a href='/item/{i}'>Link {i}</a></div>" for i in range(500))
+    return f"""<!DOCTYPE html><html><head><title>Steam Community Market</title>
+<script type="text/javascript">var g_rgAppContextData = {{}};</script>
+<script type="text/javascript">
+    var line1={json.dumps(history)};
+    g_timePriceHistoryEarliest = new Date();
+</script></head><body>
+<div id="global_header">{filler}</div>
+<div class="market_listing_largeimage"><img src="x.png"></div>
+<div id="searchResultsRows">{rows}</div>
+<span id="searchResults_total">1,158</span>
+</body></html>"""
+
+def time_per_page(func, pages, iterations):
+    """Average milliseconds per page for func over all pages"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for page in pages:
+            func(page)
+    return (time.perf_counter() - started) * 1000 / (iterations * len(pages))
+
+def main():
+    args = sys.argv[1:]
+    iterations = 20
+    if "--iterations" in args:
+        index = args.index("--iterations")
+        iterations = int(args[index + 1])
+        del args[index:index + 2]
+
+    if args:
+        pages = []
+        for path in args:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+        source = f"{len(pages)} saved page(s)"
+    else:
+        pages = [build_synthetic_page()]
+        source = "1 synthetic page"
+
+    average_kb = sum(len(page) for page in pages) / len(pages) / 1024
+    print(f"Benchmarking {source}, average size {average_kb:.0f} KB, {iterations} iterations")
+
+    if server.lxml_html is None:
+        print("lxml is not installed; only the BeautifulSoup path is available")
+        return 1
+
+    for page in pages:
+        fast = server._extract_listing_fields_lxml(page)
+        slow = server._extract_listing_fields_soup(page)
+        if fast != slow:
+            print(f"✗ Extraction mismatch: lxml={fast} soup={slow}")
+            return 1
+
+    soup_ms = time_per_page(server._extract_listing_fields_soup, pages, iterations)
+    lxml_ms = time_per_page(server._extract_listing_fields_lxml, pages, iterations)
+    print(f"  BeautifulSoup html.parser: {soup_ms:8.2f} ms/page")
+    print(f"  lxml fast path:            {lxml_ms:8.2f} ms/page")
+    print(f"  Reduction: {1 - lxml_ms / soup_ms:.1%} ({soup_ms / lxml_ms:.1f}x faster)")
+
+    history_ms = time_per_page(server.extract_price_history, pages, iterations)
+    print(f"  Price history extraction:  {history_ms:8.2f} ms/page")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
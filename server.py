@@ -1,18 +1,453 @@
 import sys
 import json
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # lxml is optional; BeautifulSoup stays the fallback parser
+    etree = None
+    lxml_html = None
+try:
+    import orjson
+except ImportError:  # orjson is optional; the json module stays the fallback encoder
+    orjson = None
 import re
+import calendar
+import operator
+import bisect
+import heapq
+from array import array
 import time
 import logging
-from datetime import datetime, timedelta
+import os
+import threading
+import contextvars
+import cProfile
+import pstats
+import tempfile
+import sqlite3
+import urllib.parse
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Configure logging for debugging
 logging.basicConfig(level=logging.ERROR, stream=sys.stderr)
 
+# Concurrency settings for the JSON-RPC dispatcher and the item-page fetch engine
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("STEAM_MCP_MAX_CONCURRENT_REQUESTS", "8"))
+MAX_FETCH_WORKERS = int(os.environ.get("STEAM_MCP_MAX_WORKERS", "4"))
+
+# Tool result text: pretty-printed by default, compact (no whitespace) when enabled here or per call via _meta
+COMPACT_JSON = os.environ.get("STEAM_MCP_COMPACT_JSON", "0").lower() in ("1", "true", "yes")
+# "auto" uses orjson when it is installed, "json" forces the standard library encoder
+JSON_BACKEND = os.environ.get("STEAM_MCP_JSON_BACKEND", "auto")
+
+# Steam Community base URL (point it at a local stub server for testing)
+STEAM_COMMUNITY_URL = os.environ.get("STEAM_MCP_COMMUNITY_URL", "https://steamcommunity.com").rstrip("/")
+
+# Request budgets (requests per second) per endpoint class, enforced per host
+REQUESTS_PER_SECOND = float(os.environ.get("STEAM_MCP_REQUESTS_PER_SECOND", "2.0"))
+SEARCH_REQUESTS_PER_SECOND = float(os.environ.get("STEAM_MCP_SEARCH_REQUESTS_PER_SECOND", "1.0"))
+PRICE_API_REQUESTS_PER_SECOND = float(os.environ.get("STEAM_MCP_PRICE_API_REQUESTS_PER_SECOND", "1.0"))
+RATE_LIMIT_BURST = float(os.environ.get("STEAM_MCP_RATE_BURST", "2"))
+RATE_LIMITS = {
+    "listing": REQUESTS_PER_SECOND,
+    "search": SEARCH_REQUESTS_PER_SECOND,
+    "price_api": PRICE_API_REQUESTS_PER_SECOND,
+    "default": SEARCH_REQUESTS_PER_SECOND,
+}
+HTTP_MAX_RETRIES = int(os.environ.get("STEAM_MCP_MAX_RETRIES", "2"))
+
+# Connection pool settings for the shared HTTP client
+HTTP_POOL_CONNECTIONS = int(os.environ.get("STEAM_MCP_POOL_CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("STEAM_MCP_POOL_MAXSIZE", str(max(10, MAX_FETCH_WORKERS * 2))))
+
+# Headers sent with every request by the shared HTTP client
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Connection": "keep-alive",
+}
+
+# Extra headers for market listing pages
+PAGE_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "DNT": "1",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+# Result cache limits and per-tool time-to-live (seconds)
+CACHE_MAX_ENTRIES = int(os.environ.get("STEAM_MCP_CACHE_MAX_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.environ.get("STEAM_MCP_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+CACHE_SWEEP_INTERVAL = float(os.environ.get("STEAM_MCP_CACHE_SWEEP_INTERVAL", "60"))
+CACHE_TTL_SECONDS = {
+    "get_popular_items_24h": 300,
+    "get_most_expensive_sold_24h": 600,
+    "get_most_expensive_sold_weekly": 3600,
+    "default": 600,
+}
+
+# Per-tool overrides, e.g. STEAM_MCP_CACHE_TTLS="get_popular_items_24h=120,get_most_expensive_sold_weekly=7200"
+for _ttl_override in os.environ.get("STEAM_MCP_CACHE_TTLS", "").split(","):
+    if "=" in _ttl_override:
+        _tool, _ttl = _ttl_override.split("=", 1)
+        CACHE_TTL_SECONDS[_tool.strip()] = float(_ttl)
+
+# How long past its TTL a ranking result may still be served while a refresh runs (seconds)
+CACHE_MAX_STALE_SECONDS = {
+    "get_popular_items_24h": 900,
+    "get_most_expensive_sold_24h": 1800,
+    "get_most_expensive_sold_weekly": 6 * 3600,
+    "default": 0,
+}
+
+# Same format as STEAM_MCP_CACHE_TTLS, e.g. STEAM_MCP_CACHE_MAX_STALE="get_popular_items_24h=300"
+for _stale_override in os.environ.get("STEAM_MCP_CACHE_MAX_STALE", "").split(","):
+    if "=" in _stale_override:
+        _tool, _stale = _stale_override.split("=", 1)
+        CACHE_MAX_STALE_SECONDS[_tool.strip()] = float(_stale)
+
+# Serve stale ranking results by default; callers can still override per call with allow_stale
+SERVE_STALE = os.environ.get("STEAM_MCP_SERVE_STALE", "0").lower() in ("1", "true", "yes")
+
+# Opt-in background prewarming of the curated item lists and ranking results, e.g. STEAM_MCP_PREWARM_APPIDS="730,440,570"
+PREWARM_APPIDS = [appid.strip() for appid in os.environ.get("STEAM_MCP_PREWARM_APPIDS", "").split(",") if appid.strip()]
+PREWARM_MAX_RESULTS = int(os.environ.get("STEAM_MCP_PREWARM_MAX_RESULTS", "10"))
+# Share of the listing request budget prewarming may use; the rest stays free for interactive calls
+PREWARM_BUDGET_SHARE = float(os.environ.get("STEAM_MCP_PREWARM_BUDGET_SHARE", "0.5"))
+# Entries are refreshed once this fraction of their TTL has passed, so they never expire between refreshes
+PREWARM_REFRESH_FRACTION = 0.8
+
+# Optional on-disk second-tier cache (disabled unless a path is configured)
+DISK_CACHE_PATH = os.environ.get("STEAM_MCP_DISK_CACHE", "")
+DISK_CACHE_MAX_BYTES = int(os.environ.get("STEAM_MCP_DISK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Optional Prometheus text dump of the metrics registry, rewritten every METRICS_INTERVAL seconds and on exit
+METRICS_FILE = os.environ.get("STEAM_MCP_METRICS_FILE", "")
+METRICS_INTERVAL = float(os.environ.get("STEAM_MCP_METRICS_INTERVAL", "60"))
+# Optional trace file: one Chrome trace-event per line for every stage of every tool call
+TRACE_FILE = os.environ.get("STEAM_MCP_TRACE_FILE", "")
+# Profile tool calls with cProfile: "all", or comma-separated tool names; a call can also ask via _meta.profile
+PROFILE_TOOLS = {name.strip() for name in os.environ.get("STEAM_MCP_PROFILE", "").split(",") if name.strip()}
+PROFILE_DIR = os.environ.get("STEAM_MCP_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "steam-mcp-profiles"))
+PROFILE_TOP_FUNCTIONS = int(os.environ.get("STEAM_MCP_PROFILE_TOP", "15"))
+# Upper bounds (seconds) of the latency histogram buckets
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_use_orjson = orjson is not None and JSON_BACKEND in ("auto", "orjson")
+
+def dumps(data, pretty=False):
+    """Serialize data to a JSON string with the configured backend, compact unless pretty"""
+    if _use_orjson:
+        return orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 if pretty else 0).decode("utf-8")
+    if pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False, default=str)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+class DiskCache:
+    """SQLite-backed second-tier cache that survives server restarts
+
+    Every write runs in its own transaction on a WAL-journaled database, so a
+    crash mid-write never leaves a torn entry behind. Failures are logged and
+    treated as misses: the disk tier must never break a tool call.
+    """
+
+    def __init__(self, path, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes or DISK_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, "
+                "expires_at REAL NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, cache_key):
+        """Return (data, stored_at, expires_at) for a live entry, or None"""
+        now = time.time()
+        try:
+            with self.lock, self.conn:
+                row = self.conn.execute(
+                    "SELECT value, stored_at, expires_at FROM cache WHERE key = ? AND expires_at > ?",
+                    (cache_key, now)
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, cache_key))
+        except sqlite3.Error as e:
+            logging.error(f"Disk cache read failed: {e}")
+            row = None
+
+        with self.lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, cache_key, text, stored_at, expires_at):
+        """Write an already-serialized entry, then trim the file back under its size cap"""
+        size = len(text)
+        if size > self.max_bytes:
+            return
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at, size, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (cache_key, text, stored_at, expires_at, size, stored_at)
+                )
+                self.conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+                total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+                if total > self.max_bytes:
+                    self._evict(total - self.max_bytes)
+        except sqlite3.Error as e:
+            logging.error(f"Disk cache write failed: {e}")
+
+    def _evict(self, excess):
+        # Drop least recently accessed entries until the excess is freed
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        """Return entry count, file usage and hit/miss/eviction counters"""
+        try:
+            with self.lock:
+                entries, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        except sqlite3.Error:
+            entries, total = 0, 0
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
+
+def open_disk_cache(path=None):
+    """Open the configured disk cache, or return None when it is disabled or unusable"""
+    path = path if path is not None else DISK_CACHE_PATH
+    if not path:
+        return None
+    try:
+        return DiskCache(path)
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Disk cache disabled, cannot open {path}: {e}")
+        return None
+
+class FrozenDict(dict):
+    """Read-only dict for cached values shared by concurrent requests"""
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("cached values are read-only; copy them with dict() before changing")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+def freeze(value):
+    """Return a read-only copy of value: dicts become FrozenDicts and lists tuples, recursively"""
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+class ResultCache:
+    """Bounded LRU cache with per-entry expiry and hit/miss/eviction counters
+
+    Values are frozen when stored, so hits can be handed to any number of
+    concurrent requests without copying. When a DiskCache is attached it
+    acts as a write-through second tier: L1 misses are looked up on disk
+    and promoted with their remaining TTL.
+    Expired entries are kept in memory for their tool's max staleness so
+    get_stale can serve them while a refresh runs.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttls=None, disk_cache=None, max_stale=None):
+        self.max_entries = max_entries or CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or CACHE_MAX_BYTES
+        self.ttls = ttls or CACHE_TTL_SECONDS
+        self.max_stale = max_stale if max_stale is not None else {"default": 0}
+        self.disk_cache = disk_cache
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+        self.last_sweep = time.time()
+        self.lock = threading.Lock()
+
+    def ttl_for(self, cache_key):
+        """TTL for a key, chosen by the tool name it starts with"""
+        return self.ttls.get(cache_key.split("|", 1)[0], self.ttls["default"])
+
+    def max_stale_for(self, cache_key):
+        """How long past expiry a key may still be served stale"""
+        return self.max_stale.get(cache_key.split("|", 1)[0], self.max_stale.get("default", 0))
+
+    def _remove(self, cache_key):
+        entry = self.entries.pop(cache_key)
+        self.total_bytes -= entry["size"]
+
+    def _sweep(self, now):
+        expired = [key for key, entry in self.entries.items() if entry["stale_until"] <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        self.last_sweep = now
+
+    def get(self, cache_key):
+        """Return cached data, or None when missing or expired"""
+        entry, tier = self.get_entry(cache_key)
+        return entry["data"] if entry is not None else None
+
+    def get_entry(self, cache_key):
+        """Return (entry, tier) for a live entry, tier being "memory" or "disk", or (None, None)
+
+        The entry holds the frozen data, its times and the serialized-text memo.
+        """
+        with self.lock:
+            now = time.time()
+            if now - self.last_sweep >= CACHE_SWEEP_INTERVAL:
+                self._sweep(now)
+
+            entry = self.entries.get(cache_key)
+            if entry is not None and entry["expires_at"] <= now:
+                # Past its TTL: a miss here, but kept for get_stale until its staleness bound
+                if entry["stale_until"] <= now:
+                    self._remove(cache_key)
+                    self.expirations += 1
+                entry = None
+
+            if entry is not None:
+                self.entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry, "memory"
+
+        if self.disk_cache is not None:
+            disk_entry = self.disk_cache.get(cache_key)
+            if disk_entry is not None:
+                data, stored_at, expires_at = disk_entry
+                entry = self._store(cache_key, data, len(dumps(data)), stored_at, expires_at)
+                with self.lock:
+                    self.hits += 1
+                return entry, "disk"
+
+        with self.lock:
+            self.misses += 1
+        return None, None
+
+    def get_stale(self, cache_key):
+        """Return (entry, age_seconds) for an expired entry still within its staleness bound, else None"""
+        with self.lock:
+            now = time.time()
+            entry = self.entries.get(cache_key)
+            if entry is None or not entry["expires_at"] <= now < entry["stale_until"]:
+                return None
+            self.entries.move_to_end(cache_key)
+            self.stale_hits += 1
+            return entry, now - entry["stored_at"]
+
+    def set(self, cache_key, data, ttl=None, size=None):
+        """Store data in memory (and on disk when enabled) with the tool's TTL
+
+        Callers caching objects that are not JSON-serializable pass their own
+        size estimate; such entries are kept in memory only.
+        """
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.ttl_for(cache_key))
+        if size is not None:
+            self._store(cache_key, data, size, now, expires_at)
+            return
+
+        # Serialized length is a cheap, stable stand-in for the entry's memory footprint
+        text = dumps(data)
+        self._store(cache_key, data, len(text), now, expires_at)
+        if self.disk_cache is not None:
+            self.disk_cache.set(cache_key, text, now, expires_at)
+
+    def _store(self, cache_key, data, size, stored_at, expires_at):
+        # Insert into the in-memory tier, evicting least recently used entries to stay within the caps
+        with self.lock:
+            if cache_key in self.entries:
+                self._remove(cache_key)
+            entry = {
+                "data": freeze(data),
+                "stored_at": stored_at,
+                "expires_at": expires_at,
+                "stale_until": expires_at + self.max_stale_for(cache_key),
+                "size": size,
+                "texts": {}
+            }
+            if size > self.max_bytes:
+                return entry
+
+            self.entries[cache_key] = entry
+            self.total_bytes += size
+
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+            return entry
+
+    def purge_expired(self):
+        """Drop every entry past its staleness bound now"""
+        with self.lock:
+            self._sweep(time.time())
+
+    def stats(self):
+        """Return size and hit/miss/eviction counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_hits": self.stale_hits,
+                "disk": self.disk_cache.stats() if self.disk_cache is not None else None
+            }
+
 # Global cache for storing results
-_cache = {}
-_last_request_time = {}
+# The disk tier is attached in main(), so importing the module never touches the file
+_cache = ResultCache(max_stale=CACHE_MAX_STALE_SECONDS)
 
 def get_cache_key(func_name, appid, **kwargs):
     """Generate cache key for function calls"""
@@ -21,155 +456,1404 @@ def get_cache_key(func_name, appid, **kwargs):
         key_parts.append(f"{k}={v}")
     return "|".join(key_parts)
 
-def is_cache_valid(cache_key, cache_duration_minutes=10):
-    """Check if cached data is still valid"""
-    if cache_key not in _cache:
-        return False
-
-    cached_time = _cache[cache_key].get('timestamp')
-    if not cached_time:
-        return False
-
-    cache_age = datetime.now() - cached_time
-    return cache_age < timedelta(minutes=cache_duration_minutes)
-
 def get_cached_result(cache_key):
     """Get cached result if valid"""
-    if is_cache_valid(cache_key):
-        return _cache[cache_key]['data']
-    return None
+    return _cache.get(cache_key)
 
-def set_cached_result(cache_key, data):
-    """Store result in cache"""
-    _cache[cache_key] = {
-        'data': data,
-        'timestamp': datetime.now()
-    }
+class CachedResult:
+    """A tool result served from cache, with its serialized text memoized on the cache entry
 
-def rate_limit_delay(min_delay=1.0):
-    """Implement rate limiting between requests"""
-    current_time = time.time()
-    last_time = _last_request_time.get('steam', 0)
+    The memo is shared by every hit on the same entry, so only the first
+    hit per output format pays for encoding.
+    """
 
-    time_since_last = current_time - last_time
-    if time_since_last < min_delay:
-        sleep_time = min_delay - time_since_last
-        time.sleep(sleep_time)
+    __slots__ = ("data", "texts")
 
-    _last_request_time['steam'] = time.time()
+    def __init__(self, data, texts):
+        self.data = data
+        self.texts = texts
 
-def fetch_item_data(appid, item_name):
-    """Fetch Steam market item data including current price and price history"""
-    # URL encode the item name properly
-    import urllib.parse
-    encoded_item_name = urllib.parse.quote(item_name)
-    base_url = f"https://steamcommunity.com/market/listings/{appid}/{encoded_item_name}"
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-        "Accept-Encoding": "gzip, deflate, br",
-        "DNT": "1",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-    }
+    def text(self, output_format):
+        text = self.texts.get(output_format)
+        if text is None:
+            text = self.texts[output_format] = dumps(self.data, pretty=output_format == "pretty")
+        return text
 
-    try:
-        # Add session for better request handling
-        session = requests.Session()
-        session.headers.update(headers)
+def output_format():
+    """'compact' or 'pretty', as chosen for the current request"""
+    ctx = current_request()
+    compact = ctx.compact if ctx is not None else COMPACT_JSON
+    return "compact" if compact else "pretty"
 
-        response = session.get(base_url, timeout=15)
-        if response.status_code != 200:
+def render_result(result):
+    """Serialize a tool result for the text content of a tools/call response"""
+    with Span("serialize", "serialize"):
+        if isinstance(result, CachedResult):
+            return result.text(output_format())
+        return dumps(result, pretty=output_format() == "pretty")
+
+def set_cached_result(cache_key, data):
+    """Store result in cache with the TTL of the tool that produced it"""
+    _cache.set(cache_key, data)
+
+def start_cache_janitor(interval=None):
+    """Expire cache entries in the background even when no requests arrive"""
+    interval = interval or CACHE_SWEEP_INTERVAL
+
+    def sweep():
+        while True:
+            time.sleep(interval)
+            _cache.purge_expired()
+
+    thread = threading.Thread(target=sweep, name="cache-janitor", daemon=True)
+    thread.start()
+    return thread
+
+class Histogram:
+    """Fixed-bucket latency histogram in seconds, with percentiles interpolated inside buckets"""
+
+    def __init__(self, bounds=METRIC_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """Estimate the q-quantile (0 < q <= 1), or None before the first observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                upper = min(self.bounds[i] if i < len(self.bounds) else self.max, self.max)
+                lower = min(self.bounds[i - 1] if i else 0.0, upper)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def summary(self):
+        """Count plus mean, p50, p95, p99 and max in milliseconds"""
+        ms = lambda seconds: round(seconds * 1000, 2)
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.sum / self.count) if self.count else 0.0,
+            "p50_ms": ms(self.percentile(0.5) or 0.0),
+            "p95_ms": ms(self.percentile(0.95) or 0.0),
+            "p99_ms": ms(self.percentile(0.99) or 0.0),
+            "max_ms": ms(self.max)
+        }
+
+class MetricsRegistry:
+    """In-process counters and latency histograms, keyed by metric name and labels"""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def counter_values(self, name):
+        """(labels, value) pairs recorded for a counter"""
+        with self.lock:
+            return [(dict(labels), value) for (metric, labels), value in self.counters.items() if metric == name]
+
+    def summaries(self, name, label):
+        """Histogram summaries for a metric, keyed by the value of one label"""
+        with self.lock:
             return {
-                "error": f"Steam market response failed with status {response.status_code}",
-                "item_name": item_name,
-                "appid": appid,
-                "market_url": base_url
+                dict(labels)[label]: histogram.summary()
+                for (metric, labels), histogram in sorted(self.histograms.items())
+                if metric == name
             }
 
-        soup = BeautifulSoup(response.text, "html.parser")
+    def prometheus_text(self, extra=()):
+        """Render every metric, plus extra (name, type, labels, value) samples, in the Prometheus text format"""
+        def series(name, labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return name
+            return name + "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                declare(name, "counter")
+                lines.append(f"{series(name, labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                declare(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{series(name + '_bucket', labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{series(name + '_bucket', labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{series(name + '_sum', labels)} {histogram.sum:.6f}")
+                lines.append(f"{series(name + '_count', labels)} {histogram.count}")
+        for name, kind, labels, value in extra:
+            declare(name, kind)
+            lines.append(f"{series(name, sorted(labels.items()))} {value}")
+        return "\n".join(lines) + "\n"
+
+_metrics = MetricsRegistry()
+
+class Tracer:
+    """Append Chrome trace-event 'complete' events to a file, one JSON object per line
+
+    The file opens with '[' and every line ends with a comma, which the trace
+    event format allows, so chrome://tracing and Perfetto load it as is while
+    tools that read it line by line only need to strip the trailing comma.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def emit(self, name, category, started, duration, args):
+        line = dumps({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round(started * 1e6),
+            "dur": round(duration * 1e6),
+            "pid": self.pid,
+            "tid": threading.get_native_id(),
+            "args": args
+        })
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+                if self.file.tell() == 0:
+                    self.file.write("[\n")
+            self.file.write(line + ",\n")
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+_tracer = Tracer(TRACE_FILE) if TRACE_FILE else None
+
+class Span:
+    """Time one stage of a tool call into a metrics histogram and, when tracing is on, the trace file
+
+    Labels name the histogram series and are copied into the trace event
+    args together with the JSON-RPC id of the request being served; more
+    args can be added while the span is open.
+    """
+
+    __slots__ = ("name", "category", "metric", "labels", "args", "wall", "started", "duration")
+
+    def __init__(self, name, category, metric=None, args=None, **labels):
+        self.name = name
+        self.category = category
+        self.metric = metric
+        self.labels = labels
+        self.args = args if args is not None else {}
+        self.duration = 0.0
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started
+        if self.metric is not None:
+            _metrics.observe(self.metric, self.duration, **self.labels)
+        if _tracer is not None:
+            args = {**self.labels, **self.args}
+            ctx = current_request()
+            if ctx is not None:
+                args.setdefault("request_id", ctx.request_id)
+            if exc_type is not None:
+                args["error"] = exc_type.__name__
+            _tracer.emit(self.name, self.category, self.wall, self.duration, args)
+        return False
+
+class RequestCancelled(Exception):
+    """Raised inside tool code when the client cancelled the request being served"""
+
+class RequestContext:
+    """Per-request state visible to tool code on every thread working for the request"""
+
+    def __init__(self, request_id, progress_token=None, compact=False):
+        self.request_id = request_id
+        self.progress_token = progress_token
+        self.compact = compact
+        self.cancelled = threading.Event()
+        self.response_meta = {}
+        self.profiler = None
+
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+def current_request():
+    """Return the RequestContext of the request being served, if any"""
+    return _current_request.get()
+
+def check_cancelled():
+    """Raise RequestCancelled if the request being served was cancelled"""
+    ctx = _current_request.get()
+    if ctx is not None and ctx.cancelled.is_set():
+        raise RequestCancelled(f"Request {ctx.request_id} was cancelled")
+
+def annotate_response(key, value):
+    """Attach metadata to the current request's response under result._meta"""
+    ctx = current_request()
+    if ctx is not None:
+        ctx.response_meta[key] = value
+
+class CallProfiler:
+    """cProfile one tool call across the dispatcher thread and the fetch workers it starts
+
+    Each thread gets its own profiler and the results are merged when the
+    profile is written. Python 3.12+ allows a single active profiler per
+    process, so there work that finds one already running is left out and
+    counted in skipped_threads.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def run(self, fn, *args):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            with self.lock:
+                self.skipped += 1
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            profile.disable()
+            with self.lock:
+                self.profiles.append(profile)
+
+    def write(self, path, limit=None):
+        """Dump the merged profile to path and return a summary of the top functions by cumulative time"""
+        with self.lock:
+            profiles = list(self.profiles)
+        if not profiles:
+            return {"path": None, "threads": 0, "skipped_threads": self.skipped, "top": []}
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        stats.dump_stats(path)
+
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit or PROFILE_TOP_FUNCTIONS]
+        return {
+            "path": path,
+            "threads": len(profiles),
+            "skipped_threads": self.skipped,
+            "top": [
+                {
+                    "function": function if filename == "~" else f"{function} ({os.path.basename(filename)}:{line})",
+                    "calls": calls,
+                    "cumulative_ms": round(cumulative * 1000, 2),
+                    "own_ms": round(own * 1000, 2)
+                }
+                for (filename, line, function), (_, calls, own, cumulative, _) in top
+            ]
+        }
 
-        # Check if item exists
-        error_msg = soup.find("div", {"id": "message"})
-        if error_msg and "no longer available" in error_msg.get_text().lower():
+def profile_path(tool_name, request_id):
+    """File in PROFILE_DIR for the profile of one call, named by tool and request id"""
+    safe = lambda value: re.sub(r"[^\w.-]", "_", str(value))
+    return os.path.join(PROFILE_DIR, f"{safe(tool_name)}-{safe(request_id)}.prof")
+
+def progress_requested():
+    """Whether the client asked for progress notifications on the current request"""
+    ctx = current_request()
+    return ctx is not None and ctx.progress_token is not None
+
+def report_progress(progress, total=None, message=None, partial_results=None):
+    """Send notifications/progress for the current request if the client passed a progressToken"""
+    ctx = current_request()
+    if ctx is None or ctx.progress_token is None or ctx.cancelled.is_set():
+        return
+    params = {"progressToken": ctx.progress_token, "progress": progress}
+    if total is not None:
+        params["total"] = total
+    if message:
+        params["message"] = message
+    if partial_results is not None:
+        params["_meta"] = {"partial_results": partial_results}
+    write_message({"jsonrpc": "2.0", "method": "notifications/progress", "params": params})
+
+def ranking_progress(total, max_results, sort_field):
+    """Return an on_result callback that reports progress with the current top results, or None when not requested"""
+    if not progress_requested():
+        return None
+    found = []
+
+    def on_result(done, result):
+        if result is not None:
+            found.append(result)
+        top = heapq.nlargest(max_results, found, key=operator.itemgetter(sort_field))
+        partial_results = [{k: v for k, v in item.items() if k != sort_field} for item in top]
+        report_progress(done, total, f"Analyzed {done}/{total} items", partial_results)
+
+    return on_result
+
+def endpoint_class(url):
+    """Classify a Steam URL into the endpoint class used for rate limiting"""
+    path = urllib.parse.urlparse(url).path
+    if "/market/search" in path:
+        return "search"
+    if "/market/listings/" in path:
+        return "listing"
+    if "/market/priceoverview" in path or "/market/pricehistory" in path:
+        return "price_api"
+    return "default"
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Thread-safe token bucket with AIMD rate adaptation
+
+    The rate is halved on every throttled response and grows back by a small
+    additive step on every successful one, never above the configured budget.
+    """
+
+    def __init__(self, rate, capacity=None, min_rate=0.1, increase=0.05, decrease=0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or RATE_LIMIT_BURST
+        self.min_rate = min(min_rate, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        # No tokens accrue while blocked by a Retry-After window
+        start = max(self.updated, self.blocked_until)
+        if now > start:
+            self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take one token and return how long the caller must wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(0.0, self.blocked_until - now)
+            if self.tokens < 0:
+                wait += -self.tokens / self.rate
+            self.total_wait += wait
+            return wait
+
+    def acquire(self, cancel_event=None):
+        """Block until a token is available and return the time waited
+
+        If cancel_event is set while waiting, the token is handed back and
+        RequestCancelled is raised so abandoned work stops using the budget.
+        """
+        wait = self.reserve()
+        if cancel_event is not None:
+            if cancel_event.wait(wait):
+                with self.lock:
+                    self.tokens += 1
+                raise RequestCancelled("Request cancelled while waiting for the rate limiter")
+        elif wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self):
+        """Additive increase after a successful response"""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttled(self, retry_after=None):
+        """Multiplicative decrease after a 429, honoring Retry-After when given"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def stats(self):
+        """Return the current rate and accumulated throttling figures"""
+        with self.lock:
             return {
-                "error": "Item not found or no longer available in the market",
-                "item_name": item_name,
-                "appid": appid,
-                "market_url": base_url
+                "rate": round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "throttled": self.throttled,
+                "total_wait_seconds": round(self.total_wait, 3)
             }
 
-        # Current price - try multiple selectors
-        current_price = "N/A"
-        price_selectors = [
-            "span.market_listing_price.market_listing_price_with_fee",
-            "span.market_listing_price_with_fee",
-            "span.market_listing_price",
-            ".market_listing_price_with_fee",
-            ".market_listing_price"
-        ]
+class RateLimiter:
+    """Token buckets per (host, endpoint class), shared by all worker threads"""
+
+    def __init__(self, limits=None):
+        self.limits = limits or RATE_LIMITS
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url):
+        """Get the bucket for a URL, creating it on first use"""
+        key = (urllib.parse.urlparse(url).netloc, endpoint_class(url))
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                rate = self.limits.get(key[1], self.limits["default"])
+                bucket = self.buckets[key] = TokenBucket(rate)
+            return bucket
+
+    def acquire(self, url, cancel_event=None):
+        """Wait for permission to send a request to url"""
+        return self.bucket_for(url).acquire(cancel_event)
+
+    def record_response(self, url, status_code, retry_after=None):
+        """Feed a response status back into the bucket for url"""
+        bucket = self.bucket_for(url)
+        if status_code == 429:
+            bucket.on_throttled(parse_retry_after(retry_after))
+        elif status_code < 500:
+            bucket.on_success()
+
+    def stats(self):
+        """Return statistics for every bucket keyed by 'host/endpoint_class'"""
+        with self.lock:
+            buckets = list(self.buckets.items())
+        return {f"{host}/{cls}": bucket.stats() for (host, cls), bucket in buckets}
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one in-flight execution
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for it and receive the same result (or exception). Waiting
+    callers stay responsive to their own cancellation, and if the leader's
+    request is cancelled they retry instead of inheriting its cancellation.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.executions = 0
+        self.shared = 0
+        self.lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Run fn once for all concurrent callers using key and return its result"""
+        while True:
+            with self.lock:
+                call = self.calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self.calls[key] = {"done": threading.Event(), "result": None, "error": None}
+                    self.executions += 1
+                else:
+                    self.shared += 1
+
+            if leader:
+                try:
+                    call["result"] = fn()
+                except BaseException as e:
+                    call["error"] = e
+                    raise
+                finally:
+                    with self.lock:
+                        del self.calls[key]
+                    call["done"].set()
+                return call["result"]
+
+            while not call["done"].wait(0.25):
+                check_cancelled()
+            if isinstance(call["error"], RequestCancelled):
+                continue
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+    def running(self, key):
+        """Whether a call for key is currently in flight"""
+        with self.lock:
+            return key in self.calls
+
+    def stats(self):
+        """Return how many executions ran and how many callers shared one"""
+        with self.lock:
+            return {"executions": self.executions, "shared": self.shared, "in_flight": len(self.calls)}
+
+# Concurrent identical tool scans share one execution
+_tool_flights = SingleFlight()
+
+def fetch_items_concurrently(items, worker, max_workers=None, on_result=None):
+    """Run worker(item) for each item on a bounded thread pool
+
+    Requests made by the workers are paced by the shared HTTP client's rate limiter.
+    Results are returned in input order; items whose worker returns None or raises are dropped.
+    on_result(done, result) is called on the calling thread as each item finishes.
+    Raises RequestCancelled once the request being served is cancelled.
+    """
+    max_workers = max_workers or MAX_FETCH_WORKERS
+
+    results = [None] * len(items)
+    if not items:
+        return []
+
+    def run(item):
+        check_cancelled()
+        ctx = current_request()
+        if ctx is not None and ctx.profiler is not None:
+            return ctx.profiler.run(worker, item)
+        return worker(item)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="steam-fetch") as pool:
+        # Each task gets its own copy of the caller's context so workers see the current request
+        futures = {
+            pool.submit(contextvars.copy_context().run, run, item): index
+            for index, item in enumerate(items)
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                results[futures[future]] = future.result()
+            except RequestCancelled:
+                pass
+            except Exception as e:
+                logging.error(f"Fetch worker failed: {e}")
+            if on_result is not None:
+                on_result(done, results[futures[future]])
+
+    check_cancelled()
+    return [result for result in results if result is not None]
+
+def search_headers(appid):
+    """Extra headers for market search/render requests"""
+    return {
+        "Accept": "application/json, text/javascript, */*; q=0.01",
+        "X-Requested-With": "XMLHttpRequest",
+        "Referer": f"{STEAM_COMMUNITY_URL}/market/search?appid={appid}"
+    }
 
-        for selector in price_selectors:
-            price_span = soup.select_one(selector)
-            if price_span and price_span.text.strip():
-                current_price = price_span.text.strip()
+class SteamHttpClient:
+    """Long-lived HTTP client with pooled keep-alive connections shared by all tools"""
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, rate_limiter=None):
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.inflight = SingleFlight()
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections or HTTP_POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize or HTTP_POOL_MAXSIZE
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.closed = False
+
+    def get(self, url, **kwargs):
+        """Send a rate-limited GET request over the shared connection pool
+
+        Identical concurrent GETs (same URL and query) are coalesced into one
+        request whose response is shared. Throttled (429) responses are retried
+        up to HTTP_MAX_RETRIES times after the limiter has backed off; the last
+        response is returned either way.
+        """
+        params = kwargs.get("params")
+        key = (url, tuple(sorted((params or {}).items())))
+        return self.inflight.do(key, lambda: self._get(url, **kwargs))
+
+    def _get(self, url, **kwargs):
+        ctx = current_request()
+        cancel_event = ctx.cancelled if ctx is not None else None
+        endpoint = endpoint_class(url)
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            with Span("ratelimit", "ratelimit", "steam_mcp_ratelimit_wait_seconds", endpoint=endpoint):
+                self.rate_limiter.acquire(url, cancel_event)
+            with Span("fetch", "fetch", "steam_mcp_http_request_seconds", {"url": url[:200]}, endpoint=endpoint) as span:
+                try:
+                    response = self.session.get(url, **kwargs)
+                except requests.exceptions.RequestException:
+                    _metrics.inc("steam_mcp_http_responses_total", endpoint=endpoint, status="error")
+                    raise
+                span.args["status"] = response.status_code
+                span.args["bytes"] = len(response.content)
+            _metrics.inc("steam_mcp_http_responses_total", endpoint=endpoint, status=response.status_code)
+            self.rate_limiter.record_response(url, response.status_code, response.headers.get("Retry-After"))
+            if response.status_code != 429:
                 break
+            logging.warning(f"Throttled by Steam (attempt {attempt + 1}): {url[:100]}")
+        return response
+
+    def pool_stats(self):
+        """Return per-host connection pool statistics and the overall reuse rate"""
+        hosts = {}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            stats = hosts.setdefault(host, {"requests": 0, "connections_opened": 0})
+            stats["requests"] += pool.num_requests
+            stats["connections_opened"] += pool.num_connections
+
+        total_requests = sum(stats["requests"] for stats in hosts.values())
+        total_connections = sum(stats["connections_opened"] for stats in hosts.values())
+        for stats in hosts.values():
+            stats["reuse_rate"] = round(1 - stats["connections_opened"] / stats["requests"], 3) if stats["requests"] else 0.0
+
+        return {
+            "requests": total_requests,
+            "connections_opened": total_connections,
+            "reuse_rate": round(1 - total_connections / total_requests, 3) if total_requests else 0.0,
+            "hosts": hosts
+        }
 
-        # Get price history from multiple possible sources
-        last_10_days_prices = []
+    def close(self):
+        """Close all pooled connections"""
+        if not self.closed:
+            self.closed = True
+            self.session.close()
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client():
+    """Get the process-wide HTTP client, creating it on first use"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None or _http_client.closed:
+            _http_client = SteamHttpClient()
+        return _http_client
+
+def close_http_client():
+    """Shut down the process-wide HTTP client and report its pool statistics"""
+    global _http_client
+    with _http_client_lock:
+        client, _http_client = _http_client, None
+
+    if client is None:
+        return None
+
+    stats = client.pool_stats()
+    limiter_stats = client.rate_limiter.stats()
+    client.close()
+    sys.stderr.write(
+        f"HTTP pool stats: {stats['requests']} requests over {stats['connections_opened']} connections "
+        f"(reuse rate {stats['reuse_rate']:.1%})\n"
+    )
+    for bucket, bucket_stats in limiter_stats.items():
+        sys.stderr.write(
+            f"Rate limiter {bucket}: rate {bucket_stats['rate']}/{bucket_stats['max_rate']} req/s, "
+            f"{bucket_stats['throttled']} throttled, {bucket_stats['total_wait_seconds']}s waited\n"
+        )
+    sys.stderr.flush()
+    return stats
+
+# Selectors for the fields read from a market listing page, in order of preference
+LISTING_PRICE_SELECTORS = [
+    "span.market_listing_price.market_listing_price_with_fee",
+    "span.market_listing_price_with_fee",
+    "span.market_listing_price",
+    ".market_listing_price_with_fee",
+    ".market_listing_price"
+]
+LISTING_QUANTITY_SELECTORS = [
+    "span.market_listing_num_listings_qty",
+    "span#searchResults_total"
+]
+LISTING_NAME_BLOCK_SELECTOR = "div.market_listing_item_name_block"
+LISTING_MESSAGE_SELECTOR = "div#message"
+
+def css_to_xpath(selector):
+    """Translate a simple 'tag.class#id' CSS selector into an equivalent XPath"""
+    match = re.fullmatch(r"([\w*]*)((?:[.#][\w-]+)*)", selector)
+    if not match:
+        raise ValueError(f"Unsupported selector: {selector}")
+    conditions = []
+    for kind, value in re.findall(r"([.#])([\w-]+)", match.group(2)):
+        if kind == "#":
+            conditions.append(f"@id='{value}'")
+        else:
+            conditions.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {value} ')")
+    xpath = f"//{match.group(1) or '*'}"
+    if conditions:
+        xpath += "[" + " and ".join(conditions) + "]"
+    return xpath
+
+if etree is not None:
+    _LISTING_XPATHS = {
+        "price": [etree.XPath(css_to_xpath(selector)) for selector in LISTING_PRICE_SELECTORS],
+        "quantity": [etree.XPath(css_to_xpath(selector)) for selector in LISTING_QUANTITY_SELECTORS],
+        "name_block": etree.XPath(css_to_xpath(LISTING_NAME_BLOCK_SELECTOR)),
+        "message": etree.XPath(css_to_xpath(LISTING_MESSAGE_SELECTOR)),
+    }
+
+def _first_text(tree, xpaths):
+    # First element with non-empty text, trying selectors in order of preference
+    for xpath in xpaths:
+        for element in xpath(tree):
+            text = element.text_content().strip()
+            if text:
+                return text
+    return None
+
+def _extract_listing_fields_lxml(page_html):
+    tree = lxml_html.fromstring(page_html)
+
+    message = _LISTING_XPATHS["message"](tree)
+    name_block = _LISTING_XPATHS["name_block"](tree)
+    return {
+        "not_found": bool(message) and "no longer available" in message[0].text_content().lower(),
+        "current_price": _first_text(tree, _LISTING_XPATHS["price"]) or "N/A",
+        "quantity_available": _first_text(tree, _LISTING_XPATHS["quantity"]) or "N/A",
+        "description": "".join(text.strip() for text in name_block[0].itertext()) if name_block else ""
+    }
+
+def _extract_listing_fields_soup(page_html):
+    soup = BeautifulSoup(page_html, "html.parser")
+
+    def first_text(selectors):
+        for selector in selectors:
+            element = soup.select_one(selector)
+            if element and element.text.strip():
+                return element.text.strip()
+        return None
+
+    message = soup.select_one(LISTING_MESSAGE_SELECTOR)
+    name_block = soup.select_one(LISTING_NAME_BLOCK_SELECTOR)
+    return {
+        "not_found": bool(message) and "no longer available" in message.get_text().lower(),
+        "current_price": first_text(LISTING_PRICE_SELECTORS) or "N/A",
+        "quantity_available": first_text(LISTING_QUANTITY_SELECTORS) or "N/A",
+        "description": name_block.get_text(strip=True) if name_block else ""
+    }
+
+def extract_listing_fields(page_html):
+    """Extract price, quantity, name block and availability from a market listing page
+
+    Uses a compiled-XPath pass over an lxml tree; falls back to BeautifulSoup
+    when lxml is not installed or cannot parse the page.
+    """
+    if lxml_html is not None:
+        try:
+            return _extract_listing_fields_lxml(page_html)
+        except (etree.LxmlError, ValueError) as e:
+            logging.warning(f"lxml extraction failed, falling back to BeautifulSoup: {e}")
+    return _extract_listing_fields_soup(page_html)
+
+# Assignments that introduce the price history array in listing-page scripts
+# (var line1=, "line1":, g_rgAssetPriceHistory =, pricehistory =). The leading
+# character class lets the regex engine skip ahead instead of trying every
+# alternative at every position of a multi-hundred-KB page.
+PRICE_HISTORY_RE = re.compile(r"[lgpP](?:ine1\"?|_rgAssetPriceHistory|rice[Hh]istory)\s*[=:]\s*\[")
+_json_decoder = json.JSONDecoder()
+
+def extract_price_history(page_text):
+    """Locate and decode the price history array of a listing page in a single scan
+
+    The array is decoded straight from the page text with raw_decode, so it is
+    never copied out by a regex group or matched with a backtracking '.*?'.
+    Returns the list of [date, price, volume] entries, or None if absent.
+    """
+    for match in PRICE_HISTORY_RE.finditer(page_text):
+        try:
+            data, _ = _json_decoder.raw_decode(page_text, match.end() - 1)
+        except ValueError:
+            continue
+        if isinstance(data, list) and data:
+            return data
+    return None
+
+# Window lengths for history queries
+DAY_SECONDS = 24 * 3600
+WEEK_SECONDS = 7 * DAY_SECONDS
+
+_MONTHS = {month: index for index, month in enumerate(calendar.month_abbr) if month}
+_history_date_cache = {}
 
-        # Try to find price history data in JavaScript
-        js_patterns = [
-            r"var line1=(\[.*?\]);",
-            r"line1=(\[.*?\]);",
-            r'"line1":(\[.*?\])',
-            r"g_rgAssetPriceHistory\s*=\s*(\[.*?\]);"
+def parse_history_date(label):
+    """Parse a Steam history label like 'Dec 15 2024 01: +0' into a UTC epoch timestamp"""
+    # Every item shares the same calendar of labels, so parsed labels are memoized
+    try:
+        timestamp = _history_date_cache.get(label)
+        if timestamp is not None:
+            return timestamp
+        day, hour = label.split(":", 1)[0].rsplit(" ", 1)
+        month, day_of_month, year = day.split()
+        timestamp = calendar.timegm((int(year), _MONTHS[month], int(day_of_month), int(hour), 0, 0))
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+    if len(_history_date_cache) >= 100000:
+        _history_date_cache.clear()
+    _history_date_cache[label] = timestamp
+    return timestamp
+
+def _to_float(value):
+    # Prices arrive as numbers, occasionally as strings like "$1,234.56"
+    if type(value) is float:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", "").replace("$", ""))
+    except ValueError:
+        return 0.0
+
+def _to_int(value):
+    # Volumes arrive as strings like "16" or "1,234"
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(str(value).replace(",", ""))
+    except ValueError:
+        return 0
+
+class PriceHistory:
+    """Columnar price history: parallel typed arrays of timestamps, prices and volumes
+
+    Points are parsed once from Steam's [date, price, volume] entries and kept
+    sorted by timestamp, so time windows resolve to index ranges by binary
+    search (see since/window). Aggregates take a [start, end) index window and
+    run over array slices with C-level builtins rather than per-entry Python
+    code. Unparsable prices are stored as 0.0 and ignored by the price
+    aggregates.
+    """
+
+    __slots__ = ("timestamps", "prices", "volumes")
+
+    def __init__(self, timestamps=None, prices=None, volumes=None):
+        self.timestamps = timestamps if timestamps is not None else array("d")
+        self.prices = prices if prices is not None else array("d")
+        self.volumes = volumes if volumes is not None else array("q")
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build a history from raw [date, price, volume] entries, skipping malformed ones"""
+        timestamps, prices, volumes = [], [], []
+        for entry in entries or ():
+            if not isinstance(entry, (list, tuple)) or len(entry) < 3:
+                continue
+            timestamp = parse_history_date(entry[0])
+            if timestamp is None:
+                continue
+            timestamps.append(timestamp)
+            prices.append(_to_float(entry[1]))
+            volumes.append(_to_int(entry[2]))
+
+        # Steam sends points in chronological order; sort only if it ever does not
+        if any(later < earlier for earlier, later in zip(timestamps, timestamps[1:])):
+            points = sorted(zip(timestamps, prices, volumes))
+            timestamps = [point[0] for point in points]
+            prices = [point[1] for point in points]
+            volumes = [point[2] for point in points]
+
+        # Bulk-convert once; negative values are treated as missing
+        return cls(
+            array("d", timestamps),
+            array("d", [price if price > 0 else 0.0 for price in prices]),
+            array("q", [volume if volume > 0 else 0 for volume in volumes])
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def nbytes(self):
+        """Memory used by the columns"""
+        return sum(column.itemsize * len(column) for column in (self.timestamps, self.prices, self.volumes))
+
+    def label(self, index):
+        """Steam-style date label for a point, e.g. 'Dec 15 2024 01: +0'"""
+        return time.strftime("%b %d %Y %H: +0", time.gmtime(self.timestamps[index]))
+
+    def entries(self, start=None, end=None):
+        """Points in [start, end) as Steam-style [date, price, volume] entries"""
+        return [
+            [self.label(index), self.prices[index], str(self.volumes[index])]
+            for index in range(*slice(start, end).indices(len(self)))
         ]
 
-        for pattern in js_patterns:
-            match = re.search(pattern, response.text)
-            if match:
-                try:
-                    data = json.loads(match.group(1))
-                    for entry in data[-10:]:
-                        if len(entry) >= 3:
-                            last_10_days_prices.append({
-                                "date": entry[0],
-                                "price": entry[1],
-                                "sales": entry[2]
-                            })
-                    break
-                except Exception:
-                    continue
+    def last(self, count):
+        """Start index of the window covering the last count points"""
+        return max(0, len(self) - count)
+
+    def index_at(self, timestamp):
+        """Index of the first point at or after timestamp"""
+        return bisect.bisect_left(self.timestamps, timestamp)
+
+    def since(self, seconds, now=None):
+        """Start index of the window covering the last `seconds` of wall-clock time"""
+        return self.index_at((now if now is not None else time.time()) - seconds)
+
+    def window(self, start_time, end_time=None):
+        """Index range [start, end) of the points between two epoch timestamps"""
+        start = self.index_at(start_time)
+        end = len(self) if end_time is None else bisect.bisect_left(self.timestamps, end_time, start)
+        return start, end
+
+    def volume_sum(self, start=None, end=None):
+        """Total volume sold in the window"""
+        return sum(self.volumes[start:end])
+
+    def max_price(self, start=None, end=None):
+        """Highest price in the window, 0.0 when empty"""
+        return max(self.prices[start:end], default=0.0)
+
+    def priced_points(self, start=None, end=None):
+        """Number of points in the window that carry a price"""
+        prices = self.prices[start:end]
+        return len(prices) - prices.count(0.0)
+
+    def mean_price(self, start=None, end=None):
+        """Mean of the priced points in the window, 0.0 when none"""
+        prices = self.prices[start:end]
+        priced = len(prices) - prices.count(0.0)
+        return sum(prices) / priced if priced else 0.0
+
+    def vwap(self, start=None, end=None):
+        """Volume-weighted average price over the window, 0.0 when nothing sold"""
+        volumes = self.volumes[start:end]
+        total_volume = sum(volumes)
+        if not total_volume:
+            return 0.0
+        return sum(map(operator.mul, self.prices[start:end], volumes)) / total_volume
+
+    def window_stats(self, start=None, end=None):
+        """All window aggregates at once"""
+        return {
+            "points": len(self.timestamps[start:end]),
+            "priced_points": self.priced_points(start, end),
+            "volume": self.volume_sum(start, end),
+            "max_price": self.max_price(start, end),
+            "mean_price": self.mean_price(start, end),
+            "vwap": self.vwap(start, end)
+        }
+
+# Parsed listing pages shared by every tool, keyed by (appid, item_name)
+LISTING_CACHE_TTL = float(os.environ.get("STEAM_MCP_LISTING_TTL", "300"))
+# Listings found to be gone are remembered longer, so bad names stop costing a fetch on every scan
+NOT_FOUND_TTL = float(os.environ.get("STEAM_MCP_NOT_FOUND_TTL", str(6 * 3600)))
+LISTING_CACHE_MAX_ENTRIES = int(os.environ.get("STEAM_MCP_LISTING_CACHE_MAX_ENTRIES", "2048"))
+# A multi-year price history takes about 72 KB, so the default leaves room for ~1800 such listings
+LISTING_CACHE_MAX_BYTES = int(os.environ.get("STEAM_MCP_LISTING_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+LISTING_TIMEOUT = 15
+
+# Listing fetch strategies in preference order; "html" (the full listing page) is always the last resort
+LISTING_STRATEGIES = [name.strip() for name in os.environ.get("STEAM_MCP_LISTING_STRATEGIES", "json,html").split(",") if name.strip() in ("json", "html")]
+if "html" not in LISTING_STRATEGIES:
+    LISTING_STRATEGIES.append("html")
+LISTING_STRATEGIES = LISTING_STRATEGIES[:LISTING_STRATEGIES.index("html") + 1]
+
+# Steam's pricehistory endpoint only answers for a logged-in session (the steamLoginSecure cookie)
+STEAM_LOGIN_SECURE = os.environ.get("STEAM_MCP_LOGIN_SECURE", "")
+STEAM_CURRENCY = os.environ.get("STEAM_MCP_CURRENCY", "1")
+
+# Listing fields each strategy can supply; tools ask only for the fields they use
+LISTING_FIELDS = frozenset(["not_found", "current_price", "quantity_available", "description", "history"])
+PRICE_FIELDS = frozenset(["current_price", "history"])
+ITEM_DATA_FIELDS = frozenset(["not_found", "current_price", "description", "history"])
+PRICE_API_FIELDS = frozenset(["not_found", "current_price", "description", "volume_24h"]) | (
+    frozenset(["history"]) if STEAM_LOGIN_SECURE else frozenset()
+)
+LISTING_SOURCE_FIELDS = {"json": PRICE_API_FIELDS, "html": LISTING_FIELDS | frozenset(["volume_24h"])}
+BULK_MAX_ITEMS = int(os.environ.get("STEAM_MCP_BULK_MAX_ITEMS", "200"))
+
+# Local market catalog built by paging through search/render for a whole appid
+CATALOG_PATH = os.environ.get("STEAM_MCP_CATALOG_PATH", "")
+CATALOG_PAGE_SIZE = 100  # Largest page search/render serves
+CATALOG_CHECKPOINT_PAGES = 10
+# Listings shift between pages during a crawl, so a few may be missed even when every page was fetched
+CATALOG_COMPLETE_SHARE = 0.99
+CATALOG_INCREMENTAL_PAGES = int(os.environ.get("STEAM_MCP_CATALOG_INCREMENTAL_PAGES", "5"))
+CATALOG_FULL_RECRAWL_SECONDS = float(os.environ.get("STEAM_MCP_CATALOG_FULL_RECRAWL", str(24 * 3600)))
+# Answer search_steam_items from the catalog when its coverage is known to be complete
+LOCAL_SEARCH = os.environ.get("STEAM_MCP_LOCAL_SEARCH", "1").lower() in ("1", "true", "yes")
+# How long a fully captured search result set is trusted for narrower (prefix-extended) queries
+LOCAL_SEARCH_TTL = float(os.environ.get("STEAM_MCP_LOCAL_SEARCH_TTL", "600"))
+LOCAL_SEARCH_MAX_QUERIES = 1000
+
+_listing_cache = ResultCache(
+    max_entries=LISTING_CACHE_MAX_ENTRIES,
+    max_bytes=LISTING_CACHE_MAX_BYTES,
+    ttls={"default": LISTING_CACHE_TTL}
+)
+_listing_flights = SingleFlight()
+
+class CircuitBreaker:
+    """Stop using a failing fetch strategy for a while after repeated failures
+
+    Once reset_after has passed the circuit is half-open: a single trial
+    call is let through and everyone else keeps being refused until the
+    trial records a success (closing the circuit) or a failure (opening it
+    again). A trial that reports neither within trial_timeout is given up.
+    """
+
+    def __init__(self, failure_threshold=3, reset_after=300, trial_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.trial_timeout = trial_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+        self.trial_thread = None
+        self.lock = threading.Lock()
+
+    def _trial_free(self, now):
+        return self.trial_started is None or now - self.trial_started >= self.trial_timeout
+
+    def available(self):
+        """Whether allow() would currently let a call through, without claiming the trial"""
+        with self.lock:
+            now = time.time()
+            return self.opened_at is None or (now - self.opened_at >= self.reset_after and self._trial_free(now))
+
+    def allow(self):
+        """Whether the strategy may be tried now; in the half-open state this claims the one trial call"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = time.time()
+            if now - self.opened_at < self.reset_after or not self._trial_free(now):
+                return False
+            self.trial_started = now
+            self.trial_thread = threading.get_ident()
+            return True
+
+    def release(self):
+        """End a trial held by this thread that neither succeeded nor failed, so another caller may try"""
+        with self.lock:
+            if self.trial_thread == threading.get_ident():
+                self.trial_started = None
+                self.trial_thread = None
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_started = None
+            self.trial_thread = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_started = None
+            self.trial_thread = None
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logging.warning(f"Circuit opened after {self.failures} failures; retrying in {self.reset_after}s")
+                self.opened_at = time.time()
+
+class StrategyStats:
+    """Attempts, successes, latency and response bytes per listing fetch strategy"""
+
+    def __init__(self):
+        self.strategies = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, ok, seconds, nbytes):
+        with self.lock:
+            stats = self.strategies.setdefault(name, {"attempts": 0, "successes": 0, "seconds": 0.0, "bytes": 0})
+            stats["attempts"] += 1
+            stats["successes"] += 1 if ok else 0
+            stats["seconds"] += seconds
+            stats["bytes"] += nbytes
+
+    def stats(self):
+        """Return success ratio, mean latency and mean bytes per attempt for each strategy"""
+        with self.lock:
+            return {
+                name: {
+                    "attempts": stats["attempts"],
+                    "successes": stats["successes"],
+                    "success_ratio": round(stats["successes"] / stats["attempts"], 3),
+                    "avg_ms": round(stats["seconds"] * 1000 / stats["attempts"], 1),
+                    "avg_bytes": round(stats["bytes"] / stats["attempts"])
+                }
+                for name, stats in self.strategies.items()
+            }
+
+_price_api_breaker = CircuitBreaker()
+_strategy_stats = StrategyStats()
 
-        # Get item description and exterior
-        item_description = ""
-        exterior = ""
+def listing_url(appid, item_name):
+    """Market listing page URL for an item"""
+    return f"{STEAM_COMMUNITY_URL}/market/listings/{appid}/{urllib.parse.quote(item_name)}"
+
+def new_listing(appid, item_name, market_url, status_code, source):
+    return {
+        "appid": appid,
+        "item_name": item_name,
+        "market_url": market_url,
+        "status_code": status_code,
+        "source": source,
+        "not_found": False,
+        "current_price": "N/A",
+        "quantity_available": "N/A",
+        "volume_24h": None,
+        "description": "",
+        "history": PriceHistory(),
+        "fetched_at": time.time()
+    }
 
-        # Try to extract exterior from item name or page
-        exterior_match = re.search(r'\((.*?)\)$', item_name)
-        if exterior_match:
-            exterior = exterior_match.group(1)
+def fetch_listing_page(appid, item_name, market_url=None):
+    """Fetch and parse the full listing page; returns (listing, response bytes)"""
+    market_url = market_url or listing_url(appid, item_name)
+    response = get_http_client().get(market_url, headers=PAGE_HEADERS, timeout=LISTING_TIMEOUT)
+
+    listing = new_listing(appid, item_name, market_url, response.status_code, "html")
+    if response.status_code != 200:
+        return listing, len(response.content)
+
+    page_text = response.text
+    with Span("parse", "parse", "steam_mcp_parse_seconds", stage="listing_fields"):
+        listing.update(extract_listing_fields(page_text))
+    with Span("history", "history", "steam_mcp_parse_seconds", stage="price_history"):
+        history = listing["history"] = PriceHistory.from_entries(extract_price_history(page_text))
+    listing["volume_24h"] = history.volume_sum(history.since(DAY_SECONDS))
+    return listing, len(response.content)
+
+def fetch_listing_json(appid, item_name, market_url=None):
+    """Fetch price, 24h volume and (when logged in) history from the JSON endpoints
+
+    Returns (listing, response bytes); listing is None when the caller should
+    fall back to the listing page.
+    """
+    client = get_http_client()
+    headers = {"Accept": "application/json", "Referer": market_url or listing_url(appid, item_name)}
+    params = {"appid": appid, "currency": STEAM_CURRENCY, "market_hash_name": item_name}
+
+    response = client.get(f"{STEAM_COMMUNITY_URL}/market/priceoverview/", params=params, headers=headers, timeout=LISTING_TIMEOUT)
+    nbytes = len(response.content)
+    if response.status_code in (401, 403, 429):
+        _price_api_breaker.record_failure()
+        return None, nbytes
+    overview = response.json() if response.status_code == 200 else {}
+    if not isinstance(overview, dict):
+        # A 200 with a list or null body is a broken endpoint, not an unknown item
+        _price_api_breaker.record_failure()
+        return None, nbytes
+    # Unknown items also come back unsuccessful; the listing page tells those apart
+    if not overview.get("success"):
+        return None, nbytes
+
+    listing = new_listing(appid, item_name, market_url or listing_url(appid, item_name), 200, "json")
+    listing["current_price"] = overview.get("lowest_price") or overview.get("median_price") or "N/A"
+    listing["volume_24h"] = _to_int(str(overview.get("volume", "0")).replace(",", ""))
+    listing["description"] = item_name
+
+    if STEAM_LOGIN_SECURE:
+        response = client.get(
+            f"{STEAM_COMMUNITY_URL}/market/pricehistory/", params=params, headers=headers,
+            cookies={"steamLoginSecure": STEAM_LOGIN_SECURE}, timeout=LISTING_TIMEOUT
+        )
+        nbytes += len(response.content)
+        # Steam answers 400 with an empty body when the login cookie is missing or expired
+        body = response.json() if response.status_code == 200 else None
+        prices = body.get("prices") if isinstance(body, dict) else None
+        if not isinstance(prices, list):
+            _price_api_breaker.record_failure()
+            return None, nbytes
+        with Span("history", "history", "steam_mcp_parse_seconds", stage="price_history_json"):
+            listing["history"] = PriceHistory.from_entries(prices)
+
+    _price_api_breaker.record_success()
+    return listing, nbytes
+
+LISTING_FETCHERS = {"json": fetch_listing_json, "html": fetch_listing_page}
+
+def listing_strategies(fields):
+    """Strategies, in preference order, able to supply every field in fields"""
+    return [
+        name for name in LISTING_STRATEGIES
+        if fields <= LISTING_SOURCE_FIELDS[name] and (name != "json" or _price_api_breaker.available())
+    ]
+
+def fetch_listing(appid, item_name, market_url=None, fields=LISTING_FIELDS):
+    """Fetch one listing with the cheapest strategy that covers fields, bypassing the listing cache
+
+    Returns a listing dict with status_code, source, availability, price,
+    quantity, 24h volume, description and PriceHistory. JSON endpoint
+    failures fall back to the listing page; page errors propagate.
+    """
+    strategies = listing_strategies(fields)
+    for name in strategies:
+        # While the JSON circuit is half-open only the caller holding its trial goes ahead
+        if name == "json" and not _price_api_breaker.allow():
+            continue
+        started = time.perf_counter()
+        try:
+            listing, nbytes = LISTING_FETCHERS[name](appid, item_name, market_url)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            _strategy_stats.record(name, False, time.perf_counter() - started, 0)
+            if name == "json":
+                _price_api_breaker.record_failure()
+            if name == strategies[-1]:
+                raise
+            logging.warning(f"Listing strategy {name} failed for {item_name}: {e}")
+            continue
+        if name == "json":
+            # Unknown items neither prove nor disprove the endpoint; free the trial if this call held it
+            _price_api_breaker.release()
+        ok = listing is not None and listing["status_code"] == 200
+        _strategy_stats.record(name, ok, time.perf_counter() - started, nbytes)
+        if listing is not None:
+            return listing
+
+def listing_cache_key(appid, item_name):
+    return f"listing|{appid}|{item_name}"
+
+def cached_listing(appid, item_name, fields=LISTING_FIELDS):
+    """Return the cached listing for an item if it has every field in fields, else None"""
+    listing = _listing_cache.get(listing_cache_key(appid, item_name))
+    if listing is not None and fields <= LISTING_SOURCE_FIELDS[listing["source"]]:
+        return listing
+    return None
 
-        # Look for item description
-        desc_elem = soup.find("div", class_="market_listing_item_name_block")
-        if desc_elem:
-            item_description = desc_elem.get_text(strip=True)
+def get_listing(appid, item_name, market_url=None, refresh=False, fields=LISTING_FIELDS):
+    """Get the parsed listing for an item from the shared cache, fetching it once on a miss
+
+    Only the fields the caller names are guaranteed; a listing cached from
+    the JSON endpoints is refetched from the page when it lacks one.
+    Only successful fetches (including 'no longer available' pages) are
+    cached; concurrent misses for the same item and strategy share a single
+    fetch. With refresh the cached listing is ignored and replaced.
+    """
+    cache_key = listing_cache_key(appid, item_name)
+    listing = None if refresh else cached_listing(appid, item_name, fields)
+    if listing is not None:
+        return listing
+
+    def load():
+        listing = fetch_listing(appid, item_name, market_url, fields)
+        if listing["status_code"] == 200:
+            size = listing["history"].nbytes() + len(item_name) + len(listing["description"]) + 200
+            ttl = NOT_FOUND_TTL if listing["not_found"] else None
+            _listing_cache.set(cache_key, listing, ttl=ttl, size=size)
+            if not listing["not_found"]:
+                _catalog.note_listing(listing)
+        return listing
+
+    return _listing_flights.do(f"{cache_key}|{listing_strategies(fields)[0]}", load)
+
+def item_data_from_listing(appid, item_name, listing):
+    """Build the get_steam_item_data result for a parsed listing page"""
+    base_url = listing_url(appid, item_name)
+    if listing["status_code"] != 200:
+        return {
+            "error": f"Steam market response failed with status {listing['status_code']}",
+            "item_name": item_name,
+            "appid": appid,
+            "market_url": base_url
+        }
 
+    # Check if item exists
+    if listing["not_found"]:
         return {
+            "error": "Item not found or no longer available in the market",
             "item_name": item_name,
             "appid": appid,
-            "current_price": current_price,
-            "exterior": exterior,
-            "description": item_description,
-            "last_10_days_prices": last_10_days_prices,
-            "market_url": base_url,
-            "data_points": len(last_10_days_prices),
-            "status": "success" if current_price != "N/A" else "partial_data"
+            "market_url": base_url
         }
 
+    current_price = listing["current_price"]
+
+    # Last 10 points of the price history
+    history = listing["history"]
+    last_10_days_prices = [
+        {"date": date, "price": price, "sales": sales}
+        for date, price, sales in history.entries(history.last(10))
+    ]
+
+    # Get item description and exterior
+    item_description = listing["description"]
+    exterior = ""
+
+    # Try to extract exterior from item name or page
+    exterior_match = re.search(r'\((.*?)\)$', item_name)
+    if exterior_match:
+        exterior = exterior_match.group(1)
+
+    return {
+        "item_name": item_name,
+        "appid": appid,
+        "current_price": current_price,
+        "exterior": exterior,
+        "description": item_description,
+        "last_10_days_prices": last_10_days_prices,
+        "market_url": base_url,
+        "data_points": len(last_10_days_prices),
+        "status": "success" if current_price != "N/A" else "partial_data"
+    }
+
+def item_data_result(appid, item_name, resolution, listing):
+    """item_data_from_listing plus the name resolution and, for missing items, the closest known names"""
+    result = item_data_from_listing(appid, item_name, listing)
+    if resolution is not None:
+        result["name_resolution"] = resolution
+    if listing["not_found"]:
+        result["suggestions"] = name_suggestions(appid, item_name)
+    return result
+
+def fetch_item_data(appid, item_name):
+    """Fetch Steam market item data including current price and price history"""
+    base_url = listing_url(appid, item_name)
+
+    try:
+        resolved_name, resolution = resolve_item_name(appid, item_name)
+        listing = get_listing(appid, resolved_name, fields=ITEM_DATA_FIELDS)
+        return item_data_result(appid, resolved_name, resolution, listing)
+
     except requests.exceptions.Timeout:
         return {
             "error": "Request timeout - Steam servers may be slow",
@@ -192,11 +1876,116 @@ def fetch_item_data(appid, item_name):
             "market_url": base_url
         }
 
+def get_steam_items_bulk(items):
+    """Look up many items in one call: duplicates are merged, cache hits answered first, misses fetched concurrently"""
+    pairs = []
+    for item in items:
+        if isinstance(item, dict) and item.get("appid") and isinstance(item.get("item_name"), str) and item["item_name"]:
+            pairs.append((str(item["appid"]), item["item_name"]))
+        else:
+            pairs.append(None)
+
+    # Names are resolved first, so a hit and a fetch give the same shape and two spellings of one item share a lookup
+    resolutions = {}
+    for pair in dict.fromkeys(pair for pair in pairs if pair is not None):
+        resolved_name, resolution = resolve_item_name(*pair)
+        resolutions[pair] = ((pair[0], resolved_name), resolution)
+
+    results = {}
+    misses = []
+    for target in dict.fromkeys(target for target, _ in resolutions.values()):
+        listing = cached_listing(target[0], target[1], ITEM_DATA_FIELDS)
+        if listing is not None:
+            results[target] = item_data_result(target[0], target[1], None, listing)
+        else:
+            misses.append(target)
+    cache_hits = len(results)
+
+    # Misses go through the shared client, so the rate limiter paces them
+    logging.info(f"Bulk lookup: {cache_hits} cached, fetching {len(misses)} items...")
+    unique_items = cache_hits + len(misses)
+    report_progress(cache_hits, unique_items, f"{cache_hits} items served from cache")
+    results.update(fetch_items_concurrently(
+        misses, lambda pair: (pair, fetch_item_data(*pair)),
+        on_result=lambda done, result: report_progress(cache_hits + done, unique_items, f"Fetched {done}/{len(misses)} items")
+    ))
+
+    item_results = []
+    for pair, item in zip(pairs, items):
+        if pair is None:
+            item_results.append({"error": "Invalid item: appid and item_name are required", "item": item})
+            continue
+        target, resolution = resolutions[pair]
+        result = results[target]
+        item_results.append(result if resolution is None else dict(result, name_resolution=resolution))
+    errors = sum(1 for result in item_results if "error" in result)
+    return {
+        "results": item_results,
+        "total_requested": len(items),
+        "unique_items": len(results),
+        "cache_hits": cache_hits,
+        "fetched": len(misses),
+        "errors": errors,
+        "status": "success" if errors == 0 else "partial_data" if errors < len(items) else "error"
+    }
+
+def parse_search_results(data, appid):
+    """Items of one search/render response as name/price/quantity_available/market_url dicts
+
+    Handles both the JSON 'results' list Steam returns for norender=1 and the
+    'results_html' row markup; rows without a name are skipped.
+    """
+    with Span("parse", "parse", "steam_mcp_parse_seconds", stage="search_results"):
+        return _parse_search_results(data, appid)
+
+def _parse_search_results(data, appid):
+    results = []
+    if isinstance(data.get('results'), list):
+        for row in data['results']:
+            item_name = row.get('hash_name') or row.get('name')
+            if not item_name:
+                continue
+            results.append({
+                "name": item_name,
+                "price": row.get('sell_price_text') or row.get('sale_price_text') or "N/A",
+                "quantity_available": f"{row['sell_listings']:,}" if isinstance(row.get('sell_listings'), int) else "N/A",
+                "market_url": listing_url(appid, item_name)
+            })
+        return results
+
+    if not data.get('results_html'):
+        return results
+    soup = BeautifulSoup(data['results_html'], 'html.parser')
+    for item in soup.find_all('a', class_='market_listing_row_link'):
+        # Extract item name
+        name_elem = item.find('span', class_='market_listing_item_name')
+        if not name_elem or not name_elem.text.strip():
+            continue
+
+        # Extract price
+        price_elem = item.find('span', class_='normal_price')
+        if not price_elem:
+            price_elem = item.find('span', class_='sale_price')
+
+        # Extract quantity if available
+        qty_elem = item.find('span', class_='market_listing_num_listings_qty')
+
+        results.append({
+            "name": name_elem.text.strip(),
+            "price": price_elem.text.strip() if price_elem else "N/A",
+            "quantity_available": qty_elem.text.strip() if qty_elem else "N/A",
+            "market_url": item.get('href', '')
+        })
+    return results
+
 def search_steam_items(appid, search_term, max_results=10):
-    """Search for items in Steam market by name"""
-    import urllib.parse
+    """Search for items in Steam market by name, locally when the catalog covers the query"""
+    if LOCAL_SEARCH:
+        local_result = _catalog.search(appid, search_term, max_results)
+        if local_result is not None:
+            return local_result
 
-    search_url = f"https://steamcommunity.com/market/search/render/"
+    search_url = f"{STEAM_COMMUNITY_URL}/market/search/render/"
     params = {
         'query': search_term,
         'start': 0,
@@ -208,19 +1997,10 @@ def search_steam_items(appid, search_term, max_results=10):
         'norender': 1
     }
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/json, text/javascript, */*; q=0.01",
-        "Accept-Language": "en-US,en;q=0.5",
-        "X-Requested-With": "XMLHttpRequest",
-        "Referer": f"https://steamcommunity.com/market/search?appid={appid}"
-    }
-
     try:
-        session = requests.Session()
-        session.headers.update(headers)
+        client = get_http_client()
 
-        response = session.get(search_url, params=params, timeout=15)
+        response = client.get(search_url, params=params, headers=search_headers(appid), timeout=15)
         if response.status_code != 200:
             return {
                 "error": f"Search failed with status {response.status_code}",
@@ -237,38 +2017,9 @@ def search_steam_items(appid, search_term, max_results=10):
                 "appid": appid
             }
 
-        results = []
-        if 'results_html' in data and data['results_html']:
-            soup = BeautifulSoup(data['results_html'], 'html.parser')
-            items = soup.find_all('a', class_='market_listing_row_link')
-
-            for item in items[:max_results]:
-                try:
-                    # Extract item name
-                    name_elem = item.find('span', class_='market_listing_item_name')
-                    item_name = name_elem.text.strip() if name_elem else "Unknown"
-
-                    # Extract price
-                    price_elem = item.find('span', class_='normal_price')
-                    if not price_elem:
-                        price_elem = item.find('span', class_='sale_price')
-                    price = price_elem.text.strip() if price_elem else "N/A"
-
-                    # Extract item URL
-                    item_url = item.get('href', '')
-
-                    # Extract quantity if available
-                    qty_elem = item.find('span', class_='market_listing_num_listings_qty')
-                    quantity = qty_elem.text.strip() if qty_elem else "N/A"
-
-                    results.append({
-                        "name": item_name,
-                        "price": price,
-                        "quantity_available": quantity,
-                        "market_url": item_url
-                    })
-                except Exception as e:
-                    continue
+        rows = parse_search_results(data, appid)
+        _catalog.record_search(appid, search_term, rows, data.get('total_count'))
+        results = rows[:max_results]
 
         return {
             "search_term": search_term,
@@ -291,79 +2042,690 @@ def search_steam_items(appid, search_term, max_results=10):
             "appid": appid
         }
 
-def get_popular_items_24h(appid, max_results=10):
+def normalize_item_name(item_name):
+    """Case-, star- and whitespace-insensitive form of an item name"""
+    return " ".join(item_name.replace("\u2605", " ").lower().split())
+
+def name_trigrams(normalized_name):
+    padded = f"  {normalized_name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+class ItemNameIndex:
+    """Token, prefix and trigram index over item names, one per appid
+
+    Names are split into lowercase word tokens kept in a sorted vocabulary,
+    so every query token is matched as a prefix with bisect; a name matches
+    when each query token prefixes one of its tokens. Trigrams of the
+    normalized names find close spellings for the name resolver.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.vocab = {}
+        self.trigrams = {}
+        self.normalized = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def tokens(text):
+        return re.findall(r"\w+", text.lower())
+
+    def add(self, appid, names):
+        """Index names for appid"""
+        with self.lock:
+            postings = self.postings.setdefault(appid, {})
+            vocab = self.vocab.setdefault(appid, [])
+            for token in self._index(names, postings, self.trigrams.setdefault(appid, {}), self.normalized.setdefault(appid, {})):
+                bisect.insort(vocab, token)
+
+    def rebuild(self, appid, names):
+        """Replace the index for appid with names
+
+        The new tables are built without the lock and swapped in at once, so
+        lookups keep seeing the old index until the new one is complete.
+        """
+        postings, trigrams, normalized = {}, {}, {}
+        vocab = sorted(self._index(names, postings, trigrams, normalized))
+        with self.lock:
+            self.postings[appid] = postings
+            self.vocab[appid] = vocab
+            self.trigrams[appid] = trigrams
+            self.normalized[appid] = normalized
+
+    def _index(self, names, postings, trigrams, normalized):
+        # Add names to the given tables and return the tokens that were new to postings
+        new_tokens = []
+        for item_name in names:
+            for token in self.tokens(item_name):
+                names_for_token = postings.get(token)
+                if names_for_token is None:
+                    names_for_token = postings[token] = set()
+                    new_tokens.append(token)
+                names_for_token.add(item_name)
+            normalized_name = normalize_item_name(item_name)
+            normalized[normalized_name] = item_name
+            for trigram in name_trigrams(normalized_name):
+                trigrams.setdefault(trigram, set()).add(item_name)
+        return new_tokens
+
+    def lookup(self, appid, item_name):
+        """Return the indexed name equal to item_name up to case, stars and spacing, or None"""
+        with self.lock:
+            return self.normalized.get(appid, {}).get(normalize_item_name(item_name))
+
+    def similar(self, appid, item_name, limit=5, min_score=0.6):
+        """Return up to limit (name, score) pairs closest to item_name by edit distance
+
+        Candidates are the names sharing the most trigrams with item_name;
+        score is 1 - edit distance / length of the longer normalized name.
+        """
+        target = normalize_item_name(item_name)
+        shared = {}
+        with self.lock:
+            trigrams = self.trigrams.get(appid, {})
+            for trigram in name_trigrams(target):
+                for candidate in trigrams.get(trigram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+
+        scored = []
+        for candidate in heapq.nlargest(25, shared, key=shared.get):
+            normalized_candidate = normalize_item_name(candidate)
+            distance = edit_distance(target, normalized_candidate)
+            score = 1 - distance / max(len(target), len(normalized_candidate), 1)
+            if score >= min_score:
+                scored.append((round(score, 3), candidate))
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [(candidate, score) for score, candidate in scored[:limit]]
+
+    def search(self, appid, query):
+        """Return the set of indexed names for appid matching every token of query"""
+        query_tokens = self.tokens(query)
+        with self.lock:
+            postings = self.postings.get(appid, {})
+            vocab = self.vocab.get(appid, [])
+            if not query_tokens:
+                return set().union(*postings.values())
+
+            matched = None
+            for token in query_tokens:
+                names = set()
+                i = bisect.bisect_left(vocab, token)
+                while i < len(vocab) and vocab[i].startswith(token):
+                    names |= postings[vocab[i]]
+                    i += 1
+                matched = names if matched is None else matched & names
+                if not matched:
+                    break
+            return matched
+
+class MarketCatalog:
+    """Item names with listing counts and prices per appid, crawled from search/render
+
+    A full crawl pages through every search/render offset (sorted by name,
+    so offsets are stable) on the fetch pool and checkpoints the completed
+    offsets, so a cancelled or crashed crawl resumes where it stopped. An
+    incremental crawl refreshes only the most-listed pages. Search responses
+    seen by other tools are merged in too. With a path the catalog is
+    persisted as JSON, replaced atomically on every checkpoint.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.appids = {}
+        self.index = ItemNameIndex()
+        self.complete_queries = {}
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.appids = json.load(f).get("appids", {})
+            except (OSError, ValueError) as e:
+                logging.error(f"Catalog load failed, starting empty: {e}")
+        for appid, state in self.appids.items():
+            self.index.add(appid, state["items"])
+
+    def _state(self, appid):
+        return self.appids.setdefault(appid, {
+            "items": {},
+            "total_count": None,
+            "complete": False,
+            "crawled_at": None,
+            "crawl": None
+        })
+
+    def merge(self, appid, rows, seen_at=None):
+        """Insert or update catalog entries from parsed search rows"""
+        seen_at = seen_at or time.time()
+        with self.lock:
+            items = self._state(appid)["items"]
+            for row in rows:
+                quantity = _to_int(row["quantity_available"].replace(",", "")) if row["quantity_available"] != "N/A" else None
+                items[row["name"]] = {"price": row["price"], "quantity": quantity, "seen_at": seen_at}
+        self.index.add(appid, [row["name"] for row in rows])
+
+    def note_listing(self, listing):
+        """Add an item seen on a listing fetch, keeping any richer entry already known"""
+        appid, item_name = listing["appid"], listing["item_name"]
+        with self.lock:
+            items = self._state(appid)["items"]
+            entry = items.get(item_name)
+            if entry is None:
+                quantity = listing["quantity_available"].replace(",", "")
+                items[item_name] = {"price": listing["current_price"], "quantity": _to_int(quantity) if quantity.isdigit() else None, "seen_at": time.time()}
+            elif listing["current_price"] != "N/A":
+                entry["price"] = listing["current_price"]
+        if entry is None:
+            self.index.add(appid, [item_name])
+
+    def record_search(self, appid, search_term, rows, total_count):
+        """Merge a search response; remember the query when it returned every match"""
+        self.merge(appid, rows)
+        if total_count is None or len(rows) < total_count:
+            return
+        query = " ".join(ItemNameIndex.tokens(search_term))
+        with self.lock:
+            queries = self.complete_queries.setdefault(appid, OrderedDict())
+            queries[query] = ({row["name"] for row in rows}, time.time())
+            queries.move_to_end(query)
+            while len(queries) > LOCAL_SEARCH_MAX_QUERIES:
+                queries.popitem(last=False)
+
+    def search(self, appid, search_term, max_results):
+        """Answer a search locally when coverage is known to be complete, else return None
+
+        Coverage is complete when a full crawl of appid finished within
+        CATALOG_FULL_RECRAWL_SECONDS, or when a query that this one extends
+        (e.g. "ak" for "ak-47 red") recently returned all of its matches.
+        """
+        query = " ".join(ItemNameIndex.tokens(search_term))
+        now = time.time()
+        covered = self.covers(appid)
+        with self.lock:
+            candidates = None
+            if not covered:
+                for known_query, (names, recorded_at) in self.complete_queries.get(appid, {}).items():
+                    if query.startswith(known_query) and now - recorded_at < LOCAL_SEARCH_TTL:
+                        candidates = names
+                        break
+                if candidates is None:
+                    return None
+
+        matched = self.index.search(appid, search_term)
+        if candidates is not None:
+            matched &= candidates
+
+        with self.lock:
+            items = self.appids[appid]["items"]
+            entries = [(item_name, items[item_name]) for item_name in matched if item_name in items]
+        # Most listed first, the closest local stand-in for Steam's popularity sort
+        top = heapq.nsmallest(max_results, entries, key=lambda entry: (-(entry[1]["quantity"] or 0), entry[0]))
+        return {
+            "search_term": search_term,
+            "appid": appid,
+            "total_results": len(entries),
+            "results": [
+                {
+                    "name": item_name,
+                    "price": entry["price"],
+                    "quantity_available": f"{entry['quantity']:,}" if entry["quantity"] is not None else "N/A",
+                    "market_url": listing_url(appid, item_name)
+                }
+                for item_name, entry in top
+            ],
+            "status": "success",
+            "source": "local_index",
+            "data_age_seconds": round(now - min((entry["seen_at"] for _, entry in top), default=now))
+        }
+
+    def items(self, appid):
+        """Return a snapshot of name -> {price, quantity, seen_at} for an appid"""
+        with self.lock:
+            return dict(self.appids.get(appid, {}).get("items", {}))
+
+    def get(self, appid, item_name):
+        with self.lock:
+            return self.appids.get(appid, {}).get("items", {}).get(item_name)
+
+    def is_complete(self, appid):
+        """Whether a full crawl of appid has finished"""
+        with self.lock:
+            return self.appids.get(appid, {}).get("complete", False)
+
+    def covers(self, appid):
+        """Whether a full crawl of appid finished recently enough to treat the catalog as exhaustive"""
+        with self.lock:
+            state = self.appids.get(appid)
+            return bool(state and state["complete"] and time.time() - state["crawled_at"] < CATALOG_FULL_RECRAWL_SECONDS)
+
+    def save(self):
+        """Write the catalog to its path atomically (no-op without a path)"""
+        if not self.path:
+            return
+        with self.lock:
+            text = json.dumps({"version": 1, "appids": self.appids}, ensure_ascii=False, separators=(",", ":"))
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Catalog checkpoint failed: {e}")
+
+    def fetch_page(self, appid, start, sort_column="name", sort_dir="asc"):
+        """Fetch one search/render page; returns (rows, total_count) or None on failure"""
+        params = {
+            'query': '',
+            'start': start,
+            'count': CATALOG_PAGE_SIZE,
+            'search_descriptions': 0,
+            'sort_column': sort_column,
+            'sort_dir': sort_dir,
+            'appid': appid,
+            'norender': 1
+        }
+        try:
+            response = get_http_client().get(
+                f"{STEAM_COMMUNITY_URL}/market/search/render/", params=params, headers=search_headers(appid), timeout=15
+            )
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            if not data.get('success'):
+                return None
+            return parse_search_results(data, appid), data.get('total_count', 0)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Catalog page {start} for appid {appid} failed: {e}")
+            return None
+
+    def crawl(self, appid, mode="auto"):
+        """Crawl an appid's catalog and return a summary
+
+        mode is "full", "incremental" or "auto" (resume an interrupted full
+        crawl, start a full one when the last is older than
+        CATALOG_FULL_RECRAWL_SECONDS, else refresh incrementally).
+        """
+        with self.lock:
+            state = self._state(appid)
+            if mode == "auto":
+                stale = state["crawled_at"] is None or time.time() - state["crawled_at"] >= CATALOG_FULL_RECRAWL_SECONDS
+                mode = "full" if state["crawl"] is not None or stale else "incremental"
+
+        started = time.time()
+        if mode == "incremental":
+            pages = self._crawl_incremental(appid)
+        else:
+            pages = self._crawl_full(appid)
+
+        with self.lock:
+            state = self._state(appid)
+            summary = {
+                "appid": appid,
+                "mode": mode,
+                "pages_fetched": pages,
+                "items": len(state["items"]),
+                "total_count": state["total_count"],
+                "complete": state["complete"],
+                "crawled_at": state["crawled_at"],
+                "duration_seconds": round(time.time() - started, 2)
+            }
+        self.save()
+        return summary
+
+    def _crawl_incremental(self, appid):
+        # The most-listed items change price most often; refresh just those pages
+        with self.lock:
+            total_count = self._state(appid)["total_count"]
+        offsets = [page * CATALOG_PAGE_SIZE for page in range(CATALOG_INCREMENTAL_PAGES)]
+        if total_count is not None:
+            offsets = [start for start in offsets if start < total_count] or [0]
+        pages = fetch_items_concurrently(offsets, lambda start: self.fetch_page(appid, start, "quantity", "desc"))
+        for rows, total_count in pages:
+            self.merge(appid, rows)
+        return len(pages)
+
+    def _crawl_full(self, appid):
+        with self.lock:
+            crawl = self._state(appid)["crawl"]
+        if crawl is None:
+            first = self.fetch_page(appid, 0)
+            if first is None:
+                raise RuntimeError(f"Could not fetch the first catalog page for appid {appid}")
+            rows, total_count = first
+            crawl = {"started_at": time.time(), "total_count": total_count, "done_offsets": [0]}
+            self.merge(appid, rows)
+            with self.lock:
+                state = self._state(appid)
+                state["crawl"] = crawl
+                state["total_count"] = total_count
+            self.save()
+            fetched = 1
+        else:
+            logging.info(f"Resuming catalog crawl for appid {appid} at {len(crawl['done_offsets'])} pages")
+            fetched = 0
+
+        done = set(crawl["done_offsets"])
+        offsets = [start for start in range(0, crawl["total_count"], CATALOG_PAGE_SIZE) if start not in done]
+        total_pages = len(done) + len(offsets)
+
+        def fetch(start):
+            page = self.fetch_page(appid, start)
+            return None if page is None else (start, page[0])
+
+        def on_result(count, page):
+            if page is not None:
+                start, rows = page
+                self.merge(appid, rows)
+                with self.lock:
+                    crawl["done_offsets"].append(start)
+            report_progress(len(crawl["done_offsets"]), total_pages, f"Crawled {len(crawl['done_offsets'])}/{total_pages} catalog pages")
+            if count % CATALOG_CHECKPOINT_PAGES == 0:
+                self.save()
+
+        try:
+            fetched += len(fetch_items_concurrently(offsets, fetch, on_result=on_result))
+        finally:
+            self.save()
+
+        with self.lock:
+            state = self._state(appid)
+            if len(crawl["done_offsets"]) < total_pages:
+                # Some pages failed; they are retried on the next crawl
+                return fetched
+            seen = {name: entry for name, entry in state["items"].items() if entry["seen_at"] >= crawl["started_at"]}
+            state["crawl"] = None
+            if len(seen) < crawl["total_count"] * CATALOG_COMPLETE_SHARE:
+                # Pages came back short (throttled or truncated); nothing is pruned and the next crawl starts over
+                logging.warning(f"Catalog crawl for appid {appid} saw {len(seen)} of {crawl['total_count']} items; not marking it complete")
+                state["complete"] = False
+                return fetched
+            # Entries not seen since this crawl started are no longer listed
+            state["items"] = seen
+            state["complete"] = True
+            state["crawled_at"] = time.time()
+            names = list(state["items"])
+        self.index.rebuild(appid, names)
+        return fetched
+
+    def stats(self):
+        with self.lock:
+            return {
+                appid: {"items": len(state["items"]), "complete": state["complete"], "crawled_at": state["crawled_at"]}
+                for appid, state in self.appids.items()
+            }
+
+_catalog = MarketCatalog(CATALOG_PATH)
+
+def resolve_item_name(appid, item_name):
+    """Check an item name against the known names before any request goes out
+
+    Returns (name_to_fetch, resolution). resolution is None when the name is
+    used as given; otherwise it records a correction (case, a missing or
+    extra star, spacing). A name the index does not know is still fetched:
+    even a complete crawl misses items listed since, so only the fetch can
+    say an item is gone, and that answer is cached for NOT_FOUND_TTL.
+    """
+    if _catalog.get(appid, item_name) is not None:
+        return item_name, None
+
+    known_name = _catalog.index.lookup(appid, item_name)
+    if known_name is not None:
+        return known_name, {"status": "corrected", "requested_name": item_name, "resolved_name": known_name}
+    return item_name, None
+
+def name_suggestions(appid, item_name):
+    """Closest known item names with their similarity scores"""
+    return [{"name": name, "score": score} for name, score in _catalog.index.similar(appid, item_name)]
+
+def crawl_market_catalog(appid, mode="auto"):
+    """Crawl the market catalog for an appid and summarize the result"""
+    try:
+        # One crawl per appid at a time; concurrent callers share its summary
+        summary = _tool_flights.do(f"crawl_market_catalog|{appid}", lambda: _catalog.crawl(appid, mode))
+        return {**summary, "status": "success" if summary["complete"] or summary["mode"] == "incremental" else "partial_data"}
+    except Exception as e:
+        return {
+            "error": f"Catalog crawl failed: {str(e)}",
+            "appid": appid,
+            "status": "error"
+        }
+
+# Define comprehensive seed items for reliable analysis (most commonly traded items)
+SEED_ITEMS_DB = {
+    "730": [  # CS:GO/CS2 - Most actively traded items across all price ranges
+        "AK-47 | Redline (Field-Tested)",
+        "AWP | Asiimov (Field-Tested)",
+        "M4A4 | Asiimov (Field-Tested)",
+        "AK-47 | Vulcan (Field-Tested)",
+        "AWP | Lightning Strike (Factory New)",
+        "M4A1-S | Icarus Fell (Factory New)",
+        "Glock-18 | Water Elemental (Factory New)",
+        "USP-S | Orion (Factory New)",
+        "AK-47 | Case Hardened (Field-Tested)",
+        "Desert Eagle | Blaze (Factory New)",
+        "M4A4 | Dragon King (Factory New)",
+        "AWP | Hyper Beast (Field-Tested)",
+        "AK-47 | Frontside Misty (Factory New)",
+        "M4A1-S | Cyrex (Factory New)",
+        "AWP | Electric Hive (Factory New)",
+        "AK-47 | Bloodsport (Field-Tested)",
+        "M4A4 | Neo-Noir (Field-Tested)",
+        "AWP | Containment Breach (Field-Tested)",
+        "Glock-18 | Fade (Factory New)",
+        "USP-S | Kill Confirmed (Field-Tested)",
+        "P250 | See Ya Later (Factory New)",
+        "Five-SeveN | Monkey Business (Factory New)",
+        "Tec-9 | Fuel Injector (Factory New)",
+        "MAC-10 | Neon Rider (Factory New)",
+        "MP7 | Nemesis (Factory New)"
+    ],
+    "440": [  # TF2 - Most traded items
+        "Mann Co. Supply Crate Key",
+        "Refined Metal",
+        "Scrap Metal",
+        "Reclaimed Metal",
+        "Strange Part",
+        "Tour of Duty Ticket",
+        "Name Tag",
+        "Description Tag",
+        "Paint Can",
+        "Strange Weapon"
+    ],
+    "570": [  # Dota 2 - Popular items
+        "Immortal Treasure I",
+        "Immortal Treasure II",
+        "Immortal Treasure III",
+        "Arcana",
+        "Immortal",
+        "Treasure Key",
+        "Battle Pass",
+        "Compendium"
+    ]
+}
+
+# Define comprehensive high-value items database with reliable market presence
+EXPENSIVE_ITEMS_DB = {
+    "730": [  # CS:GO/CS2 - 30 high-value items with proven market activity
+        # Ultra-rare knives (Factory New)
+        "★ Karambit | Fade (Factory New)",
+        "★ M9 Bayonet | Crimson Web (Factory New)",
+        "★ Karambit | Case Hardened (Factory New)",
+        "★ Butterfly Knife | Fade (Factory New)",
+        "★ Karambit | Doppler (Factory New)",
+        "★ Bayonet | Crimson Web (Factory New)",
+        "★ Karambit | Marble Fade (Factory New)",
+        "★ M9 Bayonet | Fade (Factory New)",
+        "★ Butterfly Knife | Crimson Web (Factory New)",
+        "★ Karambit | Tiger Tooth (Factory New)",
+        # High-value knives (Minimal Wear for better availability)
+        "★ Karambit | Fade (Minimal Wear)",
+        "★ M9 Bayonet | Doppler (Factory New)",
+        "★ Butterfly Knife | Doppler (Factory New)",
+        "★ Bayonet | Fade (Factory New)",
+        "★ Flip Knife | Crimson Web (Factory New)",
+        # Legendary weapon skins
+        "AWP | Dragon Lore (Factory New)",
+        "M4A4 | Howl (Factory New)",
+        "AK-47 | Fire Serpent (Factory New)",
+        "AWP | Medusa (Factory New)",
+        "M4A4 | Poseidon (Factory New)",
+        "AK-47 | Wild Lotus (Factory New)",
+        "AWP | Gungnir (Factory New)",
+        "M4A4 | The Emperor (Factory New)",
+        "AK-47 | X-Ray (Factory New)",
+        "AWP | Prince (Factory New)",
+        # High-value gloves
+        "★ Sport Gloves | Pandora's Box (Factory New)",
+        "★ Driver Gloves | King Snake (Factory New)",
+        "★ Specialist Gloves | Crimson Kimono (Factory New)",
+        "★ Hand Wraps | Cobalt Skulls (Factory New)",
+        "★ Bloodhound Gloves | Red Eclipse (Factory New)"
+    ],
+    "440": [  # TF2 - 10 high-value items with proven market presence
+        "Golden Frying Pan",
+        "Unusual Burning Flames Team Captain",
+        "Unusual Scorching Flames Team Captain",
+        "Unusual Sunbeams Team Captain",
+        "Unusual Cloudy Moon Team Captain",
+        "Australium Rocket Launcher",
+        "Australium Minigun",
+        "Australium Scattergun",
+        "Australium Sniper Rifle",
+        "Australium Flame Thrower"
+    ],
+    "570": [  # Dota 2 - 8 high-value items with active trading
+        "Dragonclaw Hook",
+        "Timebreaker",
+        "Stache",
+        "Alpine Stalker's Hat",
+        "Ethereal Flames War Dog",
+        "Ethereal Flames Stumpy",
+        "Immortal Treasure III 2020",
+        "Arcana Bundle"
+    ]
+}
+
+# Define ultra high-value items for different games
+ULTRA_EXPENSIVE_ITEMS_DB = {
+    "730": [  # CS:GO/CS2 - Ultra rare and expensive items
+        "★ Karambit | Case Hardened (Factory New)",
+        "★ M9 Bayonet | Crimson Web (Factory New)",
+        "★ Karambit | Crimson Web (Factory New)",
+        "AWP | Dragon Lore (Factory New)",
+        "M4A4 | Howl (Factory New)",
+        "★ Butterfly Knife | Crimson Web (Factory New)",
+        "★ Karambit | Fade (Factory New)",
+        "AK-47 | Fire Serpent (Factory New)",
+        "★ Bayonet | Case Hardened (Factory New)",
+        "★ Flip Knife | Crimson Web (Factory New)",
+        "★ Gut Knife | Crimson Web (Factory New)",
+        "★ Huntsman Knife | Crimson Web (Factory New)",
+        "★ Shadow Daggers | Crimson Web (Factory New)",
+        "★ Bowie Knife | Crimson Web (Factory New)",
+        "★ Falchion Knife | Crimson Web (Factory New)",
+        "★ Stiletto Knife | Crimson Web (Factory New)",
+        "★ Ursus Knife | Crimson Web (Factory New)",
+        "★ Navaja Knife | Crimson Web (Factory New)",
+        "★ Talon Knife | Crimson Web (Factory New)",
+        "★ Classic Knife | Crimson Web (Factory New)"
+    ],
+    "440": [  # TF2
+        "Golden Frying Pan",
+        "Unusual Burning Flames Team Captain",
+        "Unusual Scorching Flames Team Captain",
+        "Unusual Sunbeams Team Captain",
+        "Unusual Cloudy Moon Team Captain",
+        "Australium Rocket Launcher",
+        "Australium Minigun",
+        "Australium Scattergun"
+    ],
+    "570": [  # Dota 2
+        "Dragonclaw Hook",
+        "Timebreaker",
+        "Stache",
+        "Alpine Stalker's Hat",
+        "Ethereal Flames War Dog",
+        "Ethereal Flames Stumpy"
+    ]
+}
+
+def refresh_in_background(cache_key, scan):
+    """Start one background rescan for cache_key unless one is already running"""
+    if _tool_flights.running(cache_key):
+        return
+
+    def refresh():
+        try:
+            _tool_flights.do(cache_key, scan)
+        except Exception as e:
+            logging.error(f"Background refresh of {cache_key} failed: {e}")
+
+    # A plain thread starts with an empty context, so the refresh outlives the request that triggered it
+    threading.Thread(target=refresh, name="cache-refresh", daemon=True).start()
+
+def cached_scan(tool_name, appid, max_results, scan, allow_stale=None):
+    """Serve a ranking tool from cache, a stale entry, or one shared scan
+
+    Always returns a CachedResult; only a fresh cache hit shares the entry's text memo.
+    """
+    cache_key = get_cache_key(tool_name, appid, max_results=max_results)
+    entry, tier = _cache.get_entry(cache_key)
+    if entry is not None:
+        # Cache details go in the response's _meta; the frozen entry and its text memo are served as stored
+        annotate_response("cache", {"hit": True, "source": tier, "age_seconds": round(time.time() - entry["stored_at"])})
+        return CachedResult(entry["data"], entry["texts"])
+
+    run_scan = lambda: scan(appid, max_results, cache_key)
+    if allow_stale is None:
+        allow_stale = SERVE_STALE
+    if allow_stale:
+        stale = _cache.get_stale(cache_key)
+        if stale is not None:
+            entry, age = stale
+            refresh_in_background(cache_key, run_scan)
+            annotate_response("cache", {"hit": True, "source": "memory", "age_seconds": round(age), "stale": True, "refreshing": True})
+            data = entry["data"]
+            # The age also goes in the result itself so the caller sees how old the data is
+            return CachedResult(dict(
+                data,
+                stale=True,
+                cache_age_seconds=round(age),
+                note=data.get('note', '') + f' (stale result, {round(age)}s old; refresh started)'
+            ), {})
+
+    # Concurrent identical calls share one scan
+    annotate_response("cache", {"hit": False, "source": "scan"})
+    return CachedResult(_tool_flights.do(cache_key, run_scan), {})
+
+def get_popular_items_24h(appid, max_results=10, allow_stale=None):
     """Get most popular items in the last 24 hours using hybrid approach: real-time market scan + seed items for comprehensive coverage"""
+    return cached_scan("get_popular_items_24h", appid, max_results, _scan_popular_items_24h, allow_stale)
 
-    # Check cache first (shorter cache for real-time data)
-    cache_key = get_cache_key("get_popular_items_24h", appid, max_results=max_results)
-    cached_result = get_cached_result(cache_key)
-    if cached_result:
-        cached_result['note'] = cached_result.get('note', '') + ' (cached result)'
-        return cached_result
-
-    # Define comprehensive seed items for reliable analysis (most commonly traded items)
-    seed_items_db = {
-        "730": [  # CS:GO/CS2 - Most actively traded items across all price ranges
-            "AK-47 | Redline (Field-Tested)",
-            "AWP | Asiimov (Field-Tested)",
-            "M4A4 | Asiimov (Field-Tested)",
-            "AK-47 | Vulcan (Field-Tested)",
-            "AWP | Lightning Strike (Factory New)",
-            "M4A1-S | Icarus Fell (Factory New)",
-            "Glock-18 | Water Elemental (Factory New)",
-            "USP-S | Orion (Factory New)",
-            "AK-47 | Case Hardened (Field-Tested)",
-            "Desert Eagle | Blaze (Factory New)",
-            "M4A4 | Dragon King (Factory New)",
-            "AWP | Hyper Beast (Field-Tested)",
-            "AK-47 | Frontside Misty (Factory New)",
-            "M4A1-S | Cyrex (Factory New)",
-            "AWP | Electric Hive (Factory New)",
-            "AK-47 | Bloodsport (Field-Tested)",
-            "M4A4 | Neo-Noir (Field-Tested)",
-            "AWP | Containment Breach (Field-Tested)",
-            "Glock-18 | Fade (Factory New)",
-            "USP-S | Kill Confirmed (Field-Tested)",
-            "P250 | See Ya Later (Factory New)",
-            "Five-SeveN | Monkey Business (Factory New)",
-            "Tec-9 | Fuel Injector (Factory New)",
-            "MAC-10 | Neon Rider (Factory New)",
-            "MP7 | Nemesis (Factory New)"
-        ],
-        "440": [  # TF2 - Most traded items
-            "Mann Co. Supply Crate Key",
-            "Refined Metal",
-            "Scrap Metal",
-            "Reclaimed Metal",
-            "Strange Part",
-            "Tour of Duty Ticket",
-            "Name Tag",
-            "Description Tag",
-            "Paint Can",
-            "Strange Weapon"
-        ],
-        "570": [  # Dota 2 - Popular items
-            "Immortal Treasure I",
-            "Immortal Treasure II",
-            "Immortal Treasure III",
-            "Arcana",
-            "Immortal",
-            "Treasure Key",
-            "Battle Pass",
-            "Compendium"
-        ]
-    }
+# Try multiple sorting strategies for comprehensive coverage
+POPULAR_SCAN_SORTS = [
+    {'sort_column': 'quantity', 'sort_dir': 'desc', 'count': 75},  # Most active items
+    {'sort_column': 'price', 'sort_dir': 'desc', 'count': 50},     # Highest priced items
+    {'sort_column': 'name', 'sort_dir': 'asc', 'count': 25}        # Alphabetical for variety
+]
+POPULAR_SCAN_ITEMS = 30  # Analyze top 30 items only (limited to avoid timeouts)
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/json, text/javascript, */*; q=0.01",
-        "Accept-Language": "en-US,en;q=0.5",
-        "X-Requested-With": "XMLHttpRequest",
-        "Referer": f"https://steamcommunity.com/market/search?appid={appid}"
-    }
+def _scan_popular_items_24h(appid, max_results, cache_key):
+    """Run the hybrid popular-items scan and cache its result"""
 
-    session = requests.Session()
-    session.headers.update(headers)
+    client = get_http_client()
 
     all_items = []
     items_with_sales = []
@@ -372,16 +2734,9 @@ def get_popular_items_24h(appid, max_results=10):
         # Step 1: Enhanced market scan for real-time discovery with intelligent rate limiting
         logging.info(f"Performing real-time market scan for appid {appid}...")
 
-        search_url = f"https://steamcommunity.com/market/search/render/"
+        search_url = f"{STEAM_COMMUNITY_URL}/market/search/render/"
 
-        # Try multiple sorting strategies for comprehensive coverage
-        sort_strategies = [
-            {'sort_column': 'quantity', 'sort_dir': 'desc', 'count': 75},  # Most active items
-            {'sort_column': 'price', 'sort_dir': 'desc', 'count': 50},     # Highest priced items
-            {'sort_column': 'name', 'sort_dir': 'asc', 'count': 25}        # Alphabetical for variety
-        ]
-
-        for strategy in sort_strategies:
+        def scan_strategy(strategy):
             try:
                 params = {
                     'query': '',
@@ -392,60 +2747,42 @@ def get_popular_items_24h(appid, max_results=10):
                     **strategy
                 }
 
-                # Add rate limiting delay
-                rate_limit_delay(0.5)
-
-                response = session.get(search_url, params=params, timeout=12)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('success') and data.get('results_html'):
-                        soup = BeautifulSoup(data['results_html'], 'html.parser')
-                        items = soup.find_all('a', class_='market_listing_row_link')
-
-                        for item in items:
-                            try:
-                                # Extract item name
-                                name_elem = item.find('span', class_='market_listing_item_name')
-                                item_name = name_elem.text.strip() if name_elem else None
-
-                                # Extract current price
-                                price_elem = item.find('span', class_='normal_price')
-                                if not price_elem:
-                                    price_elem = item.find('span', class_='sale_price')
-                                current_price = price_elem.text.strip() if price_elem else "N/A"
-
-                                # Extract quantity available
-                                qty_elem = item.find('span', class_='market_listing_num_listings_qty')
-                                quantity = qty_elem.text.strip() if qty_elem else "0"
-
-                                # Extract item URL
-                                item_url = item.get('href', '')
-
-                                # Only add unique items with valid data
-                                if item_name and quantity != "0" and not any(existing['name'] == item_name for existing in all_items):
-                                    all_items.append({
-                                        "name": item_name,
-                                        "current_price": current_price,
-                                        "quantity_available": quantity,
-                                        "market_url": item_url
-                                    })
-
-                            except Exception as e:
-                                continue
+                response = client.get(search_url, params=params, headers=search_headers(appid), timeout=12)
+                if response.status_code != 200:
+                    return None
+                data = response.json()
+                if not data.get('success'):
+                    return None
+                rows = parse_search_results(data, appid)
+                _catalog.merge(appid, rows)
+                return rows
 
             except Exception as e:
                 logging.error(f"Market scan strategy failed: {e}")
-                continue
+                return None
+
+        # The strategies are independent pages, so they are fetched concurrently under the search rate limit
+        seen = set()
+        for rows in fetch_items_concurrently(POPULAR_SCAN_SORTS, scan_strategy):
+            for row in rows:
+                # Only add unique items with listings
+                if row['quantity_available'] not in ("0", "N/A") and row['name'] not in seen:
+                    seen.add(row['name'])
+                    all_items.append({
+                        "name": row['name'],
+                        "current_price": row['price'],
+                        "quantity_available": row['quantity_available'],
+                        "market_url": row['market_url']
+                    })
 
         # Step 2: Add seed items to ensure we have good candidates
-        seed_items = seed_items_db.get(appid, [])
+        seed_items = SEED_ITEMS_DB.get(appid, [])
         for item_name in seed_items:
-            import urllib.parse
-            encoded_item_name = urllib.parse.quote(item_name)
-            item_url = f"https://steamcommunity.com/market/listings/{appid}/{encoded_item_name}"
+            item_url = listing_url(appid, item_name)
 
             # Check if not already in list
-            if not any(item['name'] == item_name for item in all_items):
+            if item_name not in seen:
+                seen.add(item_name)
                 all_items.append({
                     "name": item_name,
                     "current_price": "N/A",
@@ -456,88 +2793,53 @@ def get_popular_items_24h(appid, max_results=10):
         logging.info(f"Found {len(all_items)} items to analyze. Checking sales data...")
 
         # Step 3: Analyze sales data for top items (limited to avoid timeouts)
-        items_to_analyze = all_items[:30]  # Analyze top 30 items only
-
-        for i, item in enumerate(items_to_analyze):
-            try:
-                logging.info(f"Analyzing item {i+1}/{len(items_to_analyze)}: {item['name'][:50]}...")
-
-                # Get detailed sales data from item page
-                response = session.get(item['market_url'], timeout=8)
-                if response.status_code != 200:
-                    continue
-
-                # Update current price if not available
-                if item['current_price'] == "N/A":
-                    soup = BeautifulSoup(response.text, "html.parser")
-                    price_selectors = [
-                        "span.market_listing_price.market_listing_price_with_fee",
-                        "span.market_listing_price_with_fee",
-                        "span.market_listing_price"
-                    ]
-
-                    for selector in price_selectors:
-                        price_span = soup.select_one(selector)
-                        if price_span and price_span.text.strip():
-                            item['current_price'] = price_span.text.strip()
-                            break
-
-                # Extract sales data from JavaScript
-                sales_24h = 0
-                total_sales = 0
-
-                # Try to find price history data
-                js_patterns = [
-                    r"var line1=(\[.*?\]);",
-                    r"line1=(\[.*?\]);",
-                    r'"line1":(\[.*?\])'
-                ]
-
-                for pattern in js_patterns:
-                    match = re.search(pattern, response.text)
-                    if match:
-                        try:
-                            data = json.loads(match.group(1))
-                            # Calculate sales in last 24 hours (last 24 data points)
-                            recent_data = data[-24:] if len(data) >= 24 else data
-                            for entry in recent_data:
-                                if len(entry) >= 3:
-                                    sales_24h += int(entry[2]) if str(entry[2]).isdigit() else 0
-
-                            # Calculate total sales
-                            for entry in data:
-                                if len(entry) >= 3:
-                                    total_sales += int(entry[2]) if str(entry[2]).isdigit() else 0
-                            break
-                        except Exception:
-                            continue
-
-                # Include items with sales data
-                if sales_24h > 0 or item['current_price'] != "N/A":
-                    items_with_sales.append({
-                        "name": item['name'],
-                        "current_price": item['current_price'],
-                        "quantity_available": item['quantity_available'],
-                        "sales_24h": sales_24h,
-                        "total_sales": total_sales,
-                        "market_url": item['market_url'],
-                        "popularity_score": sales_24h * 100 + (total_sales // 1000)  # Weighted popularity
-                    })
-
-                # Add delay to avoid rate limiting
-                rate_limit_delay(1.0)
+        items_to_analyze = all_items[:POPULAR_SCAN_ITEMS]
+
+        def analyze_item(item):
+            logging.info(f"Analyzing item: {item['name'][:50]}...")
+
+            # Get detailed sales data from the shared listing cache
+            listing = get_listing(appid, item['name'], item['market_url'], fields=PRICE_FIELDS)
+            if listing["status_code"] != 200:
+                return None
+
+            # Update current price if not available
+            current_price = item['current_price']
+            if current_price == "N/A":
+                current_price = listing["current_price"]
+
+            # Sales in the last 24 hours and over the whole history
+            history = listing["history"]
+            sales_24h = history.volume_sum(history.since(DAY_SECONDS))
+            total_sales = history.volume_sum()
+
+            # Include items with sales data
+            if sales_24h > 0 or current_price != "N/A":
+                return {
+                    "name": item['name'],
+                    "current_price": current_price,
+                    "quantity_available": item['quantity_available'],
+                    "sales_24h": sales_24h,
+                    "total_sales": total_sales,
+                    "market_url": item['market_url'],
+                    "popularity_score": sales_24h * 100 + (total_sales // 1000)  # Weighted popularity
+                }
+            return None
 
-            except Exception as e:
-                continue
+        items_with_sales = fetch_items_concurrently(
+            items_to_analyze, analyze_item,
+            on_result=ranking_progress(len(items_to_analyze), max_results, 'popularity_score')
+        )
 
         # Step 4: Sort by sales volume and return top results
-        items_with_sales.sort(key=lambda x: x['popularity_score'], reverse=True)
+        with Span("aggregate", "aggregate"):
+            items_with_sales.sort(key=lambda x: x['popularity_score'], reverse=True)
 
-        # Remove popularity_score from final results
-        final_results = []
-        for item in items_with_sales[:max_results]:
-            final_item = {k: v for k, v in item.items() if k != 'popularity_score'}
-            final_results.append(final_item)
+            # Remove popularity_score from final results
+            final_results = []
+            for item in items_with_sales[:max_results]:
+                final_item = {k: v for k, v in item.items() if k != 'popularity_score'}
+                final_results.append(final_item)
 
         result = {
             "appid": appid,
@@ -555,6 +2857,9 @@ def get_popular_items_24h(appid, max_results=10):
         set_cached_result(cache_key, result)
         return result
 
+    except RequestCancelled:
+        # Waiters sharing this scan retry it themselves instead of receiving the cancellation as an error result
+        raise
     except Exception as e:
         error_result = {
             "error": f"Hybrid scan failed: {str(e)}",
@@ -565,183 +2870,45 @@ def get_popular_items_24h(appid, max_results=10):
         # Don't cache error results
         return error_result
 
-def get_most_expensive_sold_24h(appid, max_results=10):
+def get_most_expensive_sold_24h(appid, max_results=10, allow_stale=None):
     """Get most expensive items sold in the last 24 hours by analyzing known high-value items"""
+    return cached_scan("get_most_expensive_sold_24h", appid, max_results, _scan_most_expensive_sold_24h, allow_stale)
 
-    # Check cache first
-    cache_key = get_cache_key("get_most_expensive_sold_24h", appid, max_results=max_results)
-    cached_result = get_cached_result(cache_key)
-    if cached_result:
-        cached_result['note'] = cached_result.get('note', '') + ' (cached result)'
-        return cached_result
-
-    # Define comprehensive high-value items database with reliable market presence
-    expensive_items_db = {
-        "730": [  # CS:GO/CS2 - 30 high-value items with proven market activity
-            # Ultra-rare knives (Factory New)
-            "★ Karambit | Fade (Factory New)",
-            "★ M9 Bayonet | Crimson Web (Factory New)",
-            "★ Karambit | Case Hardened (Factory New)",
-            "★ Butterfly Knife | Fade (Factory New)",
-            "★ Karambit | Doppler (Factory New)",
-            "★ Bayonet | Crimson Web (Factory New)",
-            "★ Karambit | Marble Fade (Factory New)",
-            "★ M9 Bayonet | Fade (Factory New)",
-            "★ Butterfly Knife | Crimson Web (Factory New)",
-            "★ Karambit | Tiger Tooth (Factory New)",
-            # High-value knives (Minimal Wear for better availability)
-            "★ Karambit | Fade (Minimal Wear)",
-            "★ M9 Bayonet | Doppler (Factory New)",
-            "★ Butterfly Knife | Doppler (Factory New)",
-            "★ Bayonet | Fade (Factory New)",
-            "★ Flip Knife | Crimson Web (Factory New)",
-            # Legendary weapon skins
-            "AWP | Dragon Lore (Factory New)",
-            "M4A4 | Howl (Factory New)",
-            "AK-47 | Fire Serpent (Factory New)",
-            "AWP | Medusa (Factory New)",
-            "M4A4 | Poseidon (Factory New)",
-            "AK-47 | Wild Lotus (Factory New)",
-            "AWP | Gungnir (Factory New)",
-            "M4A4 | The Emperor (Factory New)",
-            "AK-47 | X-Ray (Factory New)",
-            "AWP | Prince (Factory New)",
-            # High-value gloves
-            "★ Sport Gloves | Pandora's Box (Factory New)",
-            "★ Driver Gloves | King Snake (Factory New)",
-            "★ Specialist Gloves | Crimson Kimono (Factory New)",
-            "★ Hand Wraps | Cobalt Skulls (Factory New)",
-            "★ Bloodhound Gloves | Red Eclipse (Factory New)"
-        ],
-        "440": [  # TF2 - 10 high-value items with proven market presence
-            "Golden Frying Pan",
-            "Unusual Burning Flames Team Captain",
-            "Unusual Scorching Flames Team Captain",
-            "Unusual Sunbeams Team Captain",
-            "Unusual Cloudy Moon Team Captain",
-            "Australium Rocket Launcher",
-            "Australium Minigun",
-            "Australium Scattergun",
-            "Australium Sniper Rifle",
-            "Australium Flame Thrower"
-        ],
-        "570": [  # Dota 2 - 8 high-value items with active trading
-            "Dragonclaw Hook",
-            "Timebreaker",
-            "Stache",
-            "Alpine Stalker's Hat",
-            "Ethereal Flames War Dog",
-            "Ethereal Flames Stumpy",
-            "Immortal Treasure III 2020",
-            "Arcana Bundle"
-        ]
-    }
+def _scan_most_expensive_sold_24h(appid, max_results, cache_key):
+    """Analyze the high-value items database and cache the result"""
 
-    items_to_check = expensive_items_db.get(appid, [])
+    items_to_check = EXPENSIVE_ITEMS_DB.get(appid, [])
     if not items_to_check:
         return {
             "error": f"No expensive items database available for appid {appid}",
             "appid": appid,
-            "supported_games": list(expensive_items_db.keys())
+            "supported_games": list(EXPENSIVE_ITEMS_DB.keys())
         }
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-    }
-
-    session = requests.Session()
-    session.headers.update(headers)
-
     expensive_sales = []
 
     try:
         logging.info(f"Analyzing {len(items_to_check)} high-value items for appid {appid}...")
 
-        for i, item_name in enumerate(items_to_check):
+        def analyze_item(item_name):
             try:
-                logging.info(f"Analyzing expensive item {i+1}/{len(items_to_check)}: {item_name[:50]}...")
-
-                # Get item data including recent sales
-                import urllib.parse
-                encoded_item_name = urllib.parse.quote(item_name)
-                item_url = f"https://steamcommunity.com/market/listings/{appid}/{encoded_item_name}"
-
-                response = session.get(item_url, timeout=10)
-                if response.status_code != 200:
-                    continue
+                logging.info(f"Analyzing expensive item: {item_name[:50]}...")
 
-                soup = BeautifulSoup(response.text, "html.parser")
+                # Get item data including recent sales from the shared listing cache
+                listing = get_listing(appid, item_name, fields=PRICE_FIELDS)
+                item_url = listing["market_url"]
+                if listing["status_code"] != 200:
+                    return None
 
                 # Get current price
-                current_price = "N/A"
-                price_selectors = [
-                    "span.market_listing_price.market_listing_price_with_fee",
-                    "span.market_listing_price_with_fee",
-                    "span.market_listing_price"
-                ]
-
-                for selector in price_selectors:
-                    price_span = soup.select_one(selector)
-                    if price_span and price_span.text.strip():
-                        current_price = price_span.text.strip()
-                        break
-
-                # Enhanced sales data extraction with robust error handling
-                highest_sale_24h = 0
-                recent_sales_count = 0
-                average_sale_24h = 0
-                sale_prices = []
-                total_volume_24h = 0
-
-                # Comprehensive JavaScript patterns for price history data
-                js_patterns = [
-                    r"var line1=(\[.*?\]);",
-                    r"line1=(\[.*?\]);",
-                    r'"line1":(\[.*?\])',
-                    r"g_rgAssetPriceHistory\s*=\s*(\[.*?\]);",
-                    r"pricehistory\s*=\s*(\[.*?\]);"
-                ]
+                current_price = listing["current_price"]
 
-                for pattern in js_patterns:
-                    match = re.search(pattern, response.text, re.IGNORECASE)
-                    if match:
-                        try:
-                            data = json.loads(match.group(1))
-                            if not data or not isinstance(data, list):
-                                continue
-
-                            # Get recent sales (last 24 hours worth of data points)
-                            recent_data = data[-24:] if len(data) >= 24 else data
-
-                            for entry in recent_data:
-                                if len(entry) >= 3:
-                                    try:
-                                        # More robust price and volume extraction
-                                        price_str = str(entry[1]).replace(',', '').replace('$', '')
-                                        volume_str = str(entry[2]).replace(',', '')
-
-                                        price = float(price_str) if price_str.replace('.', '').isdigit() else 0
-                                        volume = int(volume_str) if volume_str.isdigit() else 0
-
-                                        if price > 0:
-                                            sale_prices.append(price)
-                                            if price > highest_sale_24h:
-                                                highest_sale_24h = price
-
-                                        if volume > 0:
-                                            total_volume_24h += volume
-                                            recent_sales_count += volume
-
-                                    except (ValueError, TypeError):
-                                        continue
-
-                            if sale_prices:
-                                average_sale_24h = sum(sale_prices) / len(sale_prices)
-                            break
-                        except (json.JSONDecodeError, TypeError, AttributeError):
-                            continue
+                # Sales data over the last 24 hours
+                history = listing["history"]
+                window = history.window_stats(history.since(DAY_SECONDS))
+                highest_sale_24h = window["max_price"]
+                average_sale_24h = window["mean_price"]
+                total_volume_24h = recent_sales_count = window["volume"]
 
                 # Extract numeric value for sorting
                 price_value = 0
@@ -755,33 +2922,37 @@ def get_most_expensive_sold_24h(appid, max_results=10):
 
                 # Include items with comprehensive sales data
                 if current_price != "N/A" or highest_sale_24h > 0 or total_volume_24h > 0:
-                    expensive_sales.append({
+                    return {
                         "name": item_name,
                         "current_price": current_price,
                         "highest_sale_24h": f"${highest_sale_24h:.2f}" if highest_sale_24h > 0 else "No recent sales",
                         "average_sale_24h": f"${average_sale_24h:.2f}" if average_sale_24h > 0 else "No recent sales",
                         "recent_sales_count": recent_sales_count,
                         "total_volume_24h": total_volume_24h,
-                        "price_data_points": len(sale_prices),
+                        "price_data_points": window["priced_points"],
                         "market_url": item_url,
                         "price_value": price_value
-                    })
-
-                # Add delay to avoid rate limiting
-                rate_limit_delay(1.0)
+                    }
+                return None
 
             except Exception as e:
                 logging.error(f"Error analyzing {item_name}: {str(e)}")
-                continue
+                return None
+
+        expensive_sales = fetch_items_concurrently(
+            items_to_check, analyze_item,
+            on_result=ranking_progress(len(items_to_check), max_results, 'price_value')
+        )
 
         # Sort by highest sale price and return top results
-        expensive_sales.sort(key=lambda x: x['price_value'], reverse=True)
+        with Span("aggregate", "aggregate"):
+            expensive_sales.sort(key=lambda x: x['price_value'], reverse=True)
 
-        # Remove price_value from final results
-        final_results = []
-        for item in expensive_sales[:max_results]:
-            final_item = {k: v for k, v in item.items() if k != 'price_value'}
-            final_results.append(final_item)
+            # Remove price_value from final results
+            final_results = []
+            for item in expensive_sales[:max_results]:
+                final_item = {k: v for k, v in item.items() if k != 'price_value'}
+                final_results.append(final_item)
 
         result = {
             "appid": appid,
@@ -800,6 +2971,9 @@ def get_most_expensive_sold_24h(appid, max_results=10):
         set_cached_result(cache_key, result)
         return result
 
+    except RequestCancelled:
+        # Waiters sharing this scan retry it themselves instead of receiving the cancellation as an error result
+        raise
     except Exception as e:
         return {
             "error": f"Expensive items analysis failed: {str(e)}",
@@ -808,170 +2982,55 @@ def get_most_expensive_sold_24h(appid, max_results=10):
             "status": "error"
         }
 
-def get_most_expensive_sold_weekly(appid, max_results=10):
+def get_most_expensive_sold_weekly(appid, max_results=10, allow_stale=None):
     """Get most expensive items available for sale (weekly high-value items) with current prices"""
+    return cached_scan("get_most_expensive_sold_weekly", appid, max_results, _scan_most_expensive_sold_weekly, allow_stale)
 
-    # Check cache first (longer cache for weekly data)
-    cache_key = get_cache_key("get_most_expensive_sold_weekly", appid, max_results=max_results)
-    cached_result = get_cached_result(cache_key)
-    if cached_result:
-        cached_result['note'] = cached_result.get('note', '') + ' (cached result)'
-        return cached_result
-
-    # Define ultra high-value items for different games
-    ultra_expensive_items_db = {
-        "730": [  # CS:GO/CS2 - Ultra rare and expensive items
-            "★ Karambit | Case Hardened (Factory New)",
-            "★ M9 Bayonet | Crimson Web (Factory New)",
-            "★ Karambit | Crimson Web (Factory New)",
-            "AWP | Dragon Lore (Factory New)",
-            "M4A4 | Howl (Factory New)",
-            "★ Butterfly Knife | Crimson Web (Factory New)",
-            "★ Karambit | Fade (Factory New)",
-            "AK-47 | Fire Serpent (Factory New)",
-            "★ Bayonet | Case Hardened (Factory New)",
-            "★ Flip Knife | Crimson Web (Factory New)",
-            "★ Gut Knife | Crimson Web (Factory New)",
-            "★ Huntsman Knife | Crimson Web (Factory New)",
-            "★ Shadow Daggers | Crimson Web (Factory New)",
-            "★ Bowie Knife | Crimson Web (Factory New)",
-            "★ Falchion Knife | Crimson Web (Factory New)",
-            "★ Stiletto Knife | Crimson Web (Factory New)",
-            "★ Ursus Knife | Crimson Web (Factory New)",
-            "★ Navaja Knife | Crimson Web (Factory New)",
-            "★ Talon Knife | Crimson Web (Factory New)",
-            "★ Classic Knife | Crimson Web (Factory New)"
-        ],
-        "440": [  # TF2
-            "Golden Frying Pan",
-            "Unusual Burning Flames Team Captain",
-            "Unusual Scorching Flames Team Captain",
-            "Unusual Sunbeams Team Captain",
-            "Unusual Cloudy Moon Team Captain",
-            "Australium Rocket Launcher",
-            "Australium Minigun",
-            "Australium Scattergun"
-        ],
-        "570": [  # Dota 2
-            "Dragonclaw Hook",
-            "Timebreaker",
-            "Stache",
-            "Alpine Stalker's Hat",
-            "Ethereal Flames War Dog",
-            "Ethereal Flames Stumpy"
-        ]
-    }
+def _scan_most_expensive_sold_weekly(appid, max_results, cache_key):
+    """Analyze the ultra high-value items database and cache the result"""
 
-    items_to_check = ultra_expensive_items_db.get(appid, [])
+    items_to_check = ULTRA_EXPENSIVE_ITEMS_DB.get(appid, [])
     if not items_to_check:
         return {
             "error": f"No ultra expensive items database available for appid {appid}",
             "appid": appid,
-            "supported_games": list(ultra_expensive_items_db.keys())
+            "supported_games": list(ULTRA_EXPENSIVE_ITEMS_DB.keys())
         }
 
     results = []
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-    }
 
-    session = requests.Session()
-    session.headers.update(headers)
-
-    for item_name in items_to_check:
+    def analyze_item(item_name):
         try:
-            # Get item data including weekly sales trends
-            import urllib.parse
-            encoded_item_name = urllib.parse.quote(item_name)
-            item_url = f"https://steamcommunity.com/market/listings/{appid}/{encoded_item_name}"
-
-            response = session.get(item_url, timeout=10)
-            if response.status_code != 200:
-                continue
+            # Get item data including weekly sales trends from the shared listing cache
+            listing = get_listing(appid, item_name)
+            item_url = listing["market_url"]
+            if listing["status_code"] != 200:
+                return None
+
+            # Get current price and quantity available
+            current_price = listing["current_price"]
+            quantity_available = listing["quantity_available"]
+
+            # Weekly sales data (last 7 days)
+            history = listing["history"]
+            window = history.window_stats(history.since(WEEK_SECONDS))
+            weekly_sales = window["volume"]
+            highest_weekly_price = window["max_price"]
+            average_weekly_price = window["mean_price"]
 
-            soup = BeautifulSoup(response.text, "html.parser")
+            # Only include items with price data
+            if current_price != "N/A" or highest_weekly_price > 0:
+                # Extract numeric value for sorting
+                price_value = 0
+                if current_price != "N/A":
+                    price_match = re.search(r'[\d,]+\.?\d*', current_price.replace(',', ''))
+                    if price_match:
+                        price_value = float(price_match.group().replace(',', ''))
 
-            # Get current price
-            current_price = "N/A"
-            price_selectors = [
-                "span.market_listing_price.market_listing_price_with_fee",
-                "span.market_listing_price_with_fee",
-                "span.market_listing_price"
-            ]
+                if highest_weekly_price > 0:
+                    price_value = max(price_value, highest_weekly_price)
 
-            for selector in price_selectors:
-                price_span = soup.select_one(selector)
-                if price_span and price_span.text.strip():
-                    current_price = price_span.text.strip()
-                    break
-
-            # Get quantity available
-            quantity_available = "N/A"
-            qty_selectors = [
-                "span.market_listing_num_listings_qty",
-                "span#searchResults_total"
-            ]
-
-            for selector in qty_selectors:
-                qty_span = soup.select_one(selector)
-                if qty_span and qty_span.text.strip():
-                    quantity_available = qty_span.text.strip()
-                    break
-
-            # Extract weekly sales data from JavaScript
-            weekly_sales = 0
-            highest_weekly_price = 0
-            average_weekly_price = 0
-
-            # Try to find price history data
-            js_patterns = [
-                r"var line1=(\[.*?\]);",
-                r"line1=(\[.*?\]);",
-                r'"line1":(\[.*?\])'
-            ]
-
-            for pattern in js_patterns:
-                match = re.search(pattern, response.text)
-                if match:
-                    try:
-                        data = json.loads(match.group(1))
-                        # Get weekly data (last 7 days worth of data, assuming hourly data)
-                        weekly_data = data[-168:] if len(data) >= 168 else data
-
-                        prices = []
-                        for entry in weekly_data:
-                            if len(entry) >= 3:
-                                price = float(entry[1]) if isinstance(entry[1], (int, float)) else 0
-                                volume = int(entry[2]) if str(entry[2]).isdigit() else 0
-
-                                if price > 0:
-                                    prices.append(price)
-                                    if price > highest_weekly_price:
-                                        highest_weekly_price = price
-
-                                weekly_sales += volume
-
-                        if prices:
-                            average_weekly_price = sum(prices) / len(prices)
-                        break
-                    except Exception:
-                        continue
-
-            # Only include items with price data
-            if current_price != "N/A" or highest_weekly_price > 0:
-                # Extract numeric value for sorting
-                price_value = 0
-                if current_price != "N/A":
-                    price_match = re.search(r'[\d,]+\.?\d*', current_price.replace(',', ''))
-                    if price_match:
-                        price_value = float(price_match.group().replace(',', ''))
-
-                if highest_weekly_price > 0:
-                    price_value = max(price_value, highest_weekly_price)
-
-                results.append({
+                return {
                     "name": item_name,
                     "current_price": current_price,
                     "quantity_available": quantity_available,
@@ -980,19 +3039,26 @@ def get_most_expensive_sold_weekly(appid, max_results=10):
                     "average_weekly_price": f"${average_weekly_price:.2f}" if average_weekly_price > 0 else "No sales data",
                     "market_url": item_url,
                     "price_value": price_value
-                })
+                }
+            return None
 
         except Exception as e:
-            continue
+            return None
+
+    results = fetch_items_concurrently(
+        items_to_check, analyze_item,
+        on_result=ranking_progress(len(items_to_check), max_results, 'price_value')
+    )
 
     # Sort by price value (highest first)
-    results.sort(key=lambda x: x['price_value'], reverse=True)
+    with Span("aggregate", "aggregate"):
+        results.sort(key=lambda x: x['price_value'], reverse=True)
 
-    # Remove price_value from final results and limit to max_results
-    final_results = []
-    for item in results[:max_results]:
-        final_item = {k: v for k, v in item.items() if k != 'price_value'}
-        final_results.append(final_item)
+        # Remove price_value from final results and limit to max_results
+        final_results = []
+        for item in results[:max_results]:
+            final_item = {k: v for k, v in item.items() if k != 'price_value'}
+            final_results.append(final_item)
 
     result = {
         "appid": appid,
@@ -1009,58 +3075,249 @@ def get_most_expensive_sold_weekly(appid, max_results=10):
     set_cached_result(cache_key, result)
     return result
 
-def main():
-    """Main MCP server loop with enhanced Smithery compatibility"""
-    try:
-        # Ensure stdout is flushed immediately for Smithery compatibility
-        sys.stdout.reconfigure(line_buffering=True)
-        sys.stderr.reconfigure(line_buffering=True)
-
-        # Send ready signal for Smithery
-        sys.stderr.write("MCP Server starting...\n")
-        sys.stderr.flush()
+class PrewarmScheduler:
+    """Keep listing pages and ranking results for configured appids warm in the background
+
+    Every job repeats a little before its cache TTL runs out. Jobs of the same
+    kind start at evenly spaced offsets within that period, so refreshes go
+    out at a steady rate instead of in a burst when the TTL expires. Every
+    period is stretched by the same factor when needed so that listing and
+    scan jobs together stay within the prewarm share of the request budget.
+    """
+
+    def __init__(self, appids, max_results=None):
+        self.appids = appids
+        self.max_results = max_results or PREWARM_MAX_RESULTS
+        self.runs = 0
+        self.failures = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def listing_jobs(self):
+        jobs = []
+        seen = set()
+        for appid in self.appids:
+            # The weekly ranking needs full listing pages; the other lists only need prices and history
+            for items_db, fields in ((ULTRA_EXPENSIVE_ITEMS_DB, LISTING_FIELDS), (SEED_ITEMS_DB, PRICE_FIELDS), (EXPENSIVE_ITEMS_DB, PRICE_FIELDS)):
+                for item_name in items_db.get(appid, []):
+                    if (appid, item_name) not in seen:
+                        seen.add((appid, item_name))
+                        job = lambda appid=appid, item_name=item_name, fields=fields: get_listing(appid, item_name, refresh=True, fields=fields)
+                        jobs.append((f"listing {appid} {item_name}", job))
+        return jobs
+
+    def scan_jobs(self, tool_name, scan):
+        jobs = []
+        for appid in self.appids:
+            cache_key = get_cache_key(tool_name, appid, max_results=self.max_results)
+            run_scan = lambda appid=appid, cache_key=cache_key: scan(appid, self.max_results, cache_key)
+            jobs.append((f"{tool_name} {appid}", lambda cache_key=cache_key, run_scan=run_scan: _tool_flights.do(cache_key, run_scan)))
+        return jobs
+
+    def scan_requests(self, tool_name):
+        """Upper bound on the Steam requests one round of tool_name's scan jobs sends"""
+        if tool_name == "get_popular_items_24h":
+            return len(self.appids) * (len(POPULAR_SCAN_SORTS) + POPULAR_SCAN_ITEMS)
+        # The curated-list scans read one listing per item; the listing jobs usually keep those warm, but not once
+        # a stretched listing period lets them expire, so they are charged in full
+        items_db = EXPENSIVE_ITEMS_DB if tool_name == "get_most_expensive_sold_24h" else ULTRA_EXPENSIVE_ITEMS_DB
+        return sum(len(items_db.get(appid, [])) for appid in self.appids)
+
+    def schedule(self, now):
+        """Return a heap of (due, seq, period, name, job) spread evenly over each group's period"""
+        listing_jobs = self.listing_jobs()
+        # (period, jobs, Steam requests per round)
+        groups = [(LISTING_CACHE_TTL * PREWARM_REFRESH_FRACTION, listing_jobs, len(listing_jobs))]
+        for tool_name, scan in (
+            ("get_popular_items_24h", _scan_popular_items_24h),
+            ("get_most_expensive_sold_24h", _scan_most_expensive_sold_24h),
+            ("get_most_expensive_sold_weekly", _scan_most_expensive_sold_weekly)
+        ):
+            groups.append((_cache.ttl_for(tool_name) * PREWARM_REFRESH_FRACTION, self.scan_jobs(tool_name, scan), self.scan_requests(tool_name)))
+
+        rate = sum(requests_per_round / period for period, jobs, requests_per_round in groups if jobs)
+        stretch = max(1.0, rate / (REQUESTS_PER_SECOND * PREWARM_BUDGET_SHARE))
+        heap = []
+        for period, jobs, requests_per_round in groups:
+            period *= stretch
+            for i, (name, job) in enumerate(jobs):
+                heap.append((now + period * i / len(jobs), len(heap), period, name, job))
+        heapq.heapify(heap)
+        return heap
+
+    def run(self):
+        heap = self.schedule(time.time())
+        logging.info(f"Prewarming {len(heap)} jobs for appids {', '.join(self.appids)}")
+        while heap:
+            due, seq, period, name, job = heap[0]
+            if self.stop_event.wait(max(0.0, due - time.time())):
+                return
+            heapq.heappop(heap)
+            try:
+                job()
+                self.runs += 1
+            except Exception as e:
+                self.failures += 1
+                logging.error(f"Prewarm job {name} failed: {e}")
+            # Keep the cadence, but never schedule into the past after a slow job
+            heapq.heappush(heap, (max(due + period, time.time()), seq, period, name, job))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="prewarm", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stats(self):
+        return {"appids": self.appids, "runs": self.runs, "failures": self.failures}
+
+def start_prewarm(appids=None):
+    """Start the prewarm scheduler when appids are configured, else return None"""
+    appids = appids if appids is not None else PREWARM_APPIDS
+    if not appids:
+        return None
+    scheduler = PrewarmScheduler(appids)
+    scheduler.start()
+    return scheduler
+
+METRIC_CACHES = (("results", _cache), ("listings", _listing_cache))
+
+def get_server_metrics():
+    """Tool latency percentiles, upstream HTTP timings and statuses, parse times, cache ratios and limiter waits"""
+    tools = _metrics.summaries("steam_mcp_tool_seconds", "tool")
+    for labels, value in _metrics.counter_values("steam_mcp_tool_calls_total"):
+        tool = tools.setdefault(labels["tool"], {"count": 0})
+        tool.setdefault("outcomes", {})[labels["outcome"]] = value
+
+    http = {
+        endpoint: {"latency": summary, "statuses": {}}
+        for endpoint, summary in _metrics.summaries("steam_mcp_http_request_seconds", "endpoint").items()
+    }
+    for labels, value in _metrics.counter_values("steam_mcp_http_responses_total"):
+        endpoint = http.setdefault(labels["endpoint"], {"latency": None, "statuses": {}})
+        endpoint["statuses"][str(labels["status"])] = value
+
+    caches = {}
+    for name, cache in METRIC_CACHES:
+        stats = cache.stats()
+        caches[name] = {key: stats[key] for key in ("entries", "hits", "misses", "hit_ratio", "stale_hits")}
+
+    client = _http_client
+    return {
+        "uptime_seconds": round(time.time() - _metrics.started),
+        "tools": tools,
+        "http": http,
+        "parse": _metrics.summaries("steam_mcp_parse_seconds", "stage"),
+        "rate_limiter": {
+            "wait": _metrics.summaries("steam_mcp_ratelimit_wait_seconds", "endpoint"),
+            "buckets": client.rate_limiter.stats() if client is not None else {}
+        },
+        "cache": caches,
+        "listing_strategies": _strategy_stats.stats(),
+        "status": "success"
+    }
 
-        for line in sys.stdin:
+def write_metrics_file(path=None):
+    """Write the metrics registry and cache counters to path in the Prometheus text format"""
+    path = path or METRICS_FILE
+    stats = {name: cache.stats() for name, cache in METRIC_CACHES}
+    # Prometheus expects the samples of one metric next to each other
+    extra = [
+        (metric, kind, {"cache": name}, stats[name][key])
+        for metric, kind, key in (
+            ("steam_mcp_cache_hits_total", "counter", "hits"),
+            ("steam_mcp_cache_misses_total", "counter", "misses"),
+            ("steam_mcp_cache_entries", "gauge", "entries")
+        )
+        for name in stats
+    ]
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(_metrics.prometheus_text(extra))
+    # Replace atomically so a scraper never reads a half-written file
+    os.replace(temp_path, path)
+
+def start_metrics_writer(interval=None):
+    """Rewrite METRICS_FILE periodically when it is configured, else return None"""
+    if not METRICS_FILE:
+        return None
+    interval = interval or METRICS_INTERVAL
+
+    def write():
+        while True:
+            time.sleep(interval)
             try:
-                line = line.strip()
-                if not line:
-                    continue
+                write_metrics_file()
+            except OSError as e:
+                logging.error(f"Writing metrics to {METRICS_FILE} failed: {e}")
 
-                # Log incoming request for debugging
-                logging.info(f"Received request: {line[:100]}...")
+    thread = threading.Thread(target=write, name="metrics-writer", daemon=True)
+    thread.start()
+    return thread
 
-                req = json.loads(line)
-                id_ = req.get("id")
-                method = req.get("method")
+def handle_request(req):
+    """Build the JSON-RPC response for a single request"""
+    id_ = req.get("id")
+    method = req.get("method")
 
-                if method == "initialize":
-                    resp = {
-                        "jsonrpc": "2.0",
-                        "id": id_,
-                        "result": {
-                            "protocolVersion": "2024-11-05",
-                            "capabilities": {
-                                "tools": {},
-                                "logging": {},
-                                "prompts": {},
-                                "resources": {}
+    if method == "initialize":
+        resp = {
+            "jsonrpc": "2.0",
+            "id": id_,
+            "result": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {
+                    "tools": {},
+                    "logging": {},
+                    "prompts": {},
+                    "resources": {}
+                },
+                "serverInfo": {
+                    "name": "steamtools-mcp",
+                    "version": "1.4.0"
+                }
+            }
+        }
+    elif method == "tools/list":
+        resp = {
+            "jsonrpc": "2.0",
+            "id": id_,
+            "result": {
+                "tools": [
+                    {
+                        "name": "get_steam_item_data",
+                        "description": "Fetch detailed Steam market data for a specific item including current price and price history",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {
+                                "appid": {
+                                    "type": "string",
+                                    "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
+                                },
+                                "item_name": {
+                                    "type": "string",
+                                    "description": "Exact name of the item including exterior condition (e.g., 'AK-47 | Redline (Field-Tested)')"
+                                }
                             },
-                            "serverInfo": {
-                                "name": "steamtools-mcp",
-                                "version": "1.4.0"
-                            }
+                            "required": ["appid", "item_name"]
                         }
-                    }
-                elif method == "tools/list":
-                    resp = {
-                        "jsonrpc": "2.0",
-                        "id": id_,
-                        "result": {
-                            "tools": [
-                                {
-                                    "name": "get_steam_item_data",
-                                    "description": "Fetch detailed Steam market data for a specific item including current price and price history",
-                                    "inputSchema": {
+                    },
+                    {
+                        "name": "get_steam_items_bulk",
+                        "description": "Fetch Steam market data for many items in one call; cached items are answered first and the rest fetched concurrently",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {
+                                "items": {
+                                    "type": "array",
+                                    "description": f"Items to look up (max: {BULK_MAX_ITEMS}); duplicates are fetched once",
+                                    "minItems": 1,
+                                    "maxItems": BULK_MAX_ITEMS,
+                                    "items": {
                                         "type": "object",
                                         "properties": {
                                             "appid": {
@@ -1069,323 +3326,591 @@ def main():
                                             },
                                             "item_name": {
                                                 "type": "string",
-                                                "description": "Exact name of the item including exterior condition (e.g., 'AK-47 | Redline (Field-Tested)')"
+                                                "description": "Exact name of the item including exterior condition"
                                             }
                                         },
                                         "required": ["appid", "item_name"]
                                     }
+                                }
+                            },
+                            "required": ["items"]
+                        }
+                    },
+                    {
+                        "name": "search_steam_items",
+                        "description": "Search for items in Steam market by name and get a list of matching items with prices",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {
+                                "appid": {
+                                    "type": "string",
+                                    "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
                                 },
-                                {
-                                    "name": "search_steam_items",
-                                    "description": "Search for items in Steam market by name and get a list of matching items with prices",
-                                    "inputSchema": {
-                                        "type": "object",
-                                        "properties": {
-                                            "appid": {
-                                                "type": "string",
-                                                "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
-                                            },
-                                            "search_term": {
-                                                "type": "string",
-                                                "description": "Search term to find items (e.g., 'AK-47 Redline' to find all Redline variants)"
-                                            },
-                                            "max_results": {
-                                                "type": "integer",
-                                                "description": "Maximum number of results to return (default: 10, max: 50)",
-                                                "default": 10,
-                                                "minimum": 1,
-                                                "maximum": 50
-                                            }
-                                        },
-                                        "required": ["appid", "search_term"]
-                                    }
+                                "search_term": {
+                                    "type": "string",
+                                    "description": "Search term to find items (e.g., 'AK-47 Redline' to find all Redline variants)"
                                 },
-                                {
-                                    "name": "get_popular_items_24h",
-                                    "description": "Get most popular items in the last 24 hours by sales volume with current prices and sales data",
-                                    "inputSchema": {
-                                        "type": "object",
-                                        "properties": {
-                                            "appid": {
-                                                "type": "string",
-                                                "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
-                                            },
-                                            "max_results": {
-                                                "type": "integer",
-                                                "description": "Maximum number of results to return (default: 10, max: 20)",
-                                                "default": 10,
-                                                "minimum": 1,
-                                                "maximum": 20
-                                            }
-                                        },
-                                        "required": ["appid"]
-                                    }
+                                "max_results": {
+                                    "type": "integer",
+                                    "description": "Maximum number of results to return (default: 10, max: 50)",
+                                    "default": 10,
+                                    "minimum": 1,
+                                    "maximum": 50
+                                }
+                            },
+                            "required": ["appid", "search_term"]
+                        }
+                    },
+                    {
+                        "name": "get_popular_items_24h",
+                        "description": "Get most popular items in the last 24 hours by sales volume with current prices and sales data",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {
+                                "appid": {
+                                    "type": "string",
+                                    "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
                                 },
-                                {
-                                    "name": "get_most_expensive_sold_24h",
-                                    "description": "Get most expensive items sold in the last 24 hours with sale prices and times",
-                                    "inputSchema": {
-                                        "type": "object",
-                                        "properties": {
-                                            "appid": {
-                                                "type": "string",
-                                                "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
-                                            },
-                                            "max_results": {
-                                                "type": "integer",
-                                                "description": "Maximum number of results to return (default: 10, max: 20)",
-                                                "default": 10,
-                                                "minimum": 1,
-                                                "maximum": 20
-                                            }
-                                        },
-                                        "required": ["appid"]
-                                    }
+                                "max_results": {
+                                    "type": "integer",
+                                    "description": "Maximum number of results to return (default: 10, max: 20)",
+                                    "default": 10,
+                                    "minimum": 1,
+                                    "maximum": 20
                                 },
-                                {
-                                    "name": "get_most_expensive_sold_weekly",
-                                    "description": "Get most expensive items available for sale (weekly high-value items) with current prices",
-                                    "inputSchema": {
-                                        "type": "object",
-                                        "properties": {
-                                            "appid": {
-                                                "type": "string",
-                                                "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
-                                            },
-                                            "max_results": {
-                                                "type": "integer",
-                                                "description": "Maximum number of results to return (default: 10, max: 20)",
-                                                "default": 10,
-                                                "minimum": 1,
-                                                "maximum": 20
-                                            }
-                                        },
-                                        "required": ["appid"]
-                                    }
+                                "allow_stale": {
+                                    "type": "boolean",
+                                    "description": "Return an expired cached result immediately (labelled with its age) while a refresh runs in the background"
                                 }
-                            ]
+                            },
+                            "required": ["appid"]
                         }
-                    }
-                elif method == "tools/call":
-                    params = req.get("params", {})
-                    tool_name = params.get("name")
-                    arguments = params.get("arguments", {})
-
-                    if tool_name == "get_steam_item_data":
-                        appid = arguments.get("appid")
-                        item_name = arguments.get("item_name")
-
-                        if not appid or not item_name:
-                            resp = {
-                                "jsonrpc": "2.0",
-                                "id": id_,
-                                "error": {
-                                    "code": -32602,
-                                    "message": "Invalid params: appid and item_name are required"
+                    },
+                    {
+                        "name": "get_most_expensive_sold_24h",
+                        "description": "Get most expensive items sold in the last 24 hours with sale prices and times",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {
+                                "appid": {
+                                    "type": "string",
+                                    "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
+                                },
+                                "max_results": {
+                                    "type": "integer",
+                                    "description": "Maximum number of results to return (default: 10, max: 20)",
+                                    "default": 10,
+                                    "minimum": 1,
+                                    "maximum": 20
+                                },
+                                "allow_stale": {
+                                    "type": "boolean",
+                                    "description": "Return an expired cached result immediately (labelled with its age) while a refresh runs in the background"
                                 }
-                            }
-                        else:
-                            try:
-                                result = fetch_item_data(appid, item_name)
-                                resp = {
-                                    "jsonrpc": "2.0",
-                                    "id": id_,
-                                    "result": {
-                                        "content": [
-                                            {
-                                                "type": "text",
-                                                "text": json.dumps(result, indent=2, ensure_ascii=False)
-                                            }
-                                        ]
-                                    }
+                            },
+                            "required": ["appid"]
+                        }
+                    },
+                    {
+                        "name": "get_most_expensive_sold_weekly",
+                        "description": "Get most expensive items available for sale (weekly high-value items) with current prices",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {
+                                "appid": {
+                                    "type": "string",
+                                    "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
+                                },
+                                "max_results": {
+                                    "type": "integer",
+                                    "description": "Maximum number of results to return (default: 10, max: 20)",
+                                    "default": 10,
+                                    "minimum": 1,
+                                    "maximum": 20
+                                },
+                                "allow_stale": {
+                                    "type": "boolean",
+                                    "description": "Return an expired cached result immediately (labelled with its age) while a refresh runs in the background"
                                 }
-                            except Exception as e:
-                                logging.error(f"Tool execution error: {e}")
-                                resp = {
-                                    "jsonrpc": "2.0",
-                                    "id": id_,
-                                    "error": {
-                                        "code": -32603,
-                                        "message": f"Tool execution failed: {str(e)}"
-                                    }
+                            },
+                            "required": ["appid"]
+                        }
+                    },
+                    {
+                        "name": "crawl_market_catalog",
+                        "description": "Crawl every market search page for a game into a local catalog of item names, listing counts and prices; interrupted crawls resume from their checkpoint",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {
+                                "appid": {
+                                    "type": "string",
+                                    "description": "Steam application ID (e.g., '730' for CS:GO, '440' for TF2)"
+                                },
+                                "mode": {
+                                    "type": "string",
+                                    "enum": ["auto", "full", "incremental"],
+                                    "description": "full crawls every page, incremental refreshes the most-listed pages, auto (default) resumes or picks based on catalog age",
+                                    "default": "auto"
                                 }
+                            },
+                            "required": ["appid"]
+                        }
+                    },
+                    {
+                        "name": "get_server_metrics",
+                        "description": "Server performance metrics: latency percentiles per tool, Steam request timings and status codes, parse times, cache hit ratios and rate limiter waits",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {}
+                        }
+                    }
+                ]
+            }
+        }
+    elif method == "tools/call":
+        params = req.get("params", {})
+        tool_name = params.get("name")
+        arguments = params.get("arguments", {})
 
-                    elif tool_name == "search_steam_items":
-                        appid = arguments.get("appid")
-                        search_term = arguments.get("search_term")
-                        max_results = arguments.get("max_results", 10)
-
-                        if not appid or not search_term:
-                            resp = {
-                                "jsonrpc": "2.0",
-                                "id": id_,
-                                "error": {
-                                    "code": -32602,
-                                    "message": "Invalid params: appid and search_term are required"
-                                }
-                            }
-                        else:
-                            try:
-                                # Validate max_results
-                                if not isinstance(max_results, int) or max_results < 1 or max_results > 50:
-                                    max_results = 10
-
-                                result = search_steam_items(appid, search_term, max_results)
-                                resp = {
-                                    "jsonrpc": "2.0",
-                                    "id": id_,
-                                    "result": {
-                                        "content": [
-                                            {
-                                                "type": "text",
-                                                "text": json.dumps(result, indent=2, ensure_ascii=False)
-                                            }
-                                        ]
-                                    }
-                                }
-                            except Exception as e:
-                                logging.error(f"Tool execution error: {e}")
-                                resp = {
-                                    "jsonrpc": "2.0",
-                                    "id": id_,
-                                    "error": {
-                                        "code": -32603,
-                                        "message": f"Tool execution failed: {str(e)}"
-                                    }
-                                }
+        if tool_name == "get_steam_item_data":
+            appid = arguments.get("appid")
+            item_name = arguments.get("item_name")
 
-                    elif tool_name == "get_popular_items_24h":
-                        appid = arguments.get("appid")
-                        max_results = arguments.get("max_results", 10)
-
-                        if not appid:
-                            resp = {
-                                "jsonrpc": "2.0",
-                                "id": id_,
-                                "error": {
-                                    "code": -32602,
-                                    "message": "Invalid params: appid is required"
-                                }
-                            }
-                        else:
-                            # Validate max_results
-                            if not isinstance(max_results, int) or max_results < 1 or max_results > 20:
-                                max_results = 10
-
-                            result = get_popular_items_24h(appid, max_results)
-                            resp = {
-                                "jsonrpc": "2.0",
-                                "id": id_,
-                                "result": {
-                                    "content": [
-                                        {
-                                            "type": "text",
-                                            "text": json.dumps(result, indent=2)
-                                        }
-                                    ]
+            if not appid or not item_name:
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "error": {
+                        "code": -32602,
+                        "message": "Invalid params: appid and item_name are required"
+                    }
+                }
+            else:
+                try:
+                    result = fetch_item_data(appid, item_name)
+                    resp = {
+                        "jsonrpc": "2.0",
+                        "id": id_,
+                        "result": {
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": render_result(result)
                                 }
-                            }
+                            ]
+                        }
+                    }
+                except Exception as e:
+                    logging.error(f"Tool execution error: {e}")
+                    resp = {
+                        "jsonrpc": "2.0",
+                        "id": id_,
+                        "error": {
+                            "code": -32603,
+                            "message": f"Tool execution failed: {str(e)}"
+                        }
+                    }
+
+        elif tool_name == "get_steam_items_bulk":
+            items = arguments.get("items")
 
-                    elif tool_name == "get_most_expensive_sold_24h":
-                        appid = arguments.get("appid")
-                        max_results = arguments.get("max_results", 10)
-
-                        if not appid:
-                            resp = {
-                                "jsonrpc": "2.0",
-                                "id": id_,
-                                "error": {
-                                    "code": -32602,
-                                    "message": "Invalid params: appid is required"
+            if not isinstance(items, list) or not items or len(items) > BULK_MAX_ITEMS:
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "error": {
+                        "code": -32602,
+                        "message": f"Invalid params: items must be a list of 1 to {BULK_MAX_ITEMS} {{appid, item_name}} objects"
+                    }
+                }
+            else:
+                try:
+                    result = get_steam_items_bulk(items)
+                    resp = {
+                        "jsonrpc": "2.0",
+                        "id": id_,
+                        "result": {
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": render_result(result)
                                 }
-                            }
-                        else:
-                            # Validate max_results
-                            if not isinstance(max_results, int) or max_results < 1 or max_results > 20:
-                                max_results = 10
-
-                            result = get_most_expensive_sold_24h(appid, max_results)
-                            resp = {
-                                "jsonrpc": "2.0",
-                                "id": id_,
-                                "result": {
-                                    "content": [
-                                        {
-                                            "type": "text",
-                                            "text": json.dumps(result, indent=2)
-                                        }
-                                    ]
+                            ]
+                        }
+                    }
+                except Exception as e:
+                    logging.error(f"Tool execution error: {e}")
+                    resp = {
+                        "jsonrpc": "2.0",
+                        "id": id_,
+                        "error": {
+                            "code": -32603,
+                            "message": f"Tool execution failed: {str(e)}"
+                        }
+                    }
+
+        elif tool_name == "search_steam_items":
+            appid = arguments.get("appid")
+            search_term = arguments.get("search_term")
+            max_results = arguments.get("max_results", 10)
+
+            if not appid or not search_term:
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "error": {
+                        "code": -32602,
+                        "message": "Invalid params: appid and search_term are required"
+                    }
+                }
+            else:
+                try:
+                    # Validate max_results
+                    if not isinstance(max_results, int) or max_results < 1 or max_results > 50:
+                        max_results = 10
+
+                    result = search_steam_items(appid, search_term, max_results)
+                    resp = {
+                        "jsonrpc": "2.0",
+                        "id": id_,
+                        "result": {
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": render_result(result)
                                 }
+                            ]
+                        }
+                    }
+                except Exception as e:
+                    logging.error(f"Tool execution error: {e}")
+                    resp = {
+                        "jsonrpc": "2.0",
+                        "id": id_,
+                        "error": {
+                            "code": -32603,
+                            "message": f"Tool execution failed: {str(e)}"
+                        }
+                    }
+
+        elif tool_name == "get_popular_items_24h":
+            appid = arguments.get("appid")
+            max_results = arguments.get("max_results", 10)
+
+            if not appid:
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "error": {
+                        "code": -32602,
+                        "message": "Invalid params: appid is required"
+                    }
+                }
+            else:
+                # Validate max_results
+                if not isinstance(max_results, int) or max_results < 1 or max_results > 20:
+                    max_results = 10
+
+                result = get_popular_items_24h(appid, max_results, arguments.get("allow_stale"))
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": render_result(result)
                             }
+                        ]
+                    }
+                }
 
-                    elif tool_name == "get_most_expensive_sold_weekly":
-                        appid = arguments.get("appid")
-                        max_results = arguments.get("max_results", 10)
-
-                        if not appid:
-                            resp = {
-                                "jsonrpc": "2.0",
-                                "id": id_,
-                                "error": {
-                                    "code": -32602,
-                                    "message": "Invalid params: appid is required"
-                                }
+        elif tool_name == "get_most_expensive_sold_24h":
+            appid = arguments.get("appid")
+            max_results = arguments.get("max_results", 10)
+
+            if not appid:
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "error": {
+                        "code": -32602,
+                        "message": "Invalid params: appid is required"
+                    }
+                }
+            else:
+                # Validate max_results
+                if not isinstance(max_results, int) or max_results < 1 or max_results > 20:
+                    max_results = 10
+
+                result = get_most_expensive_sold_24h(appid, max_results, arguments.get("allow_stale"))
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": render_result(result)
                             }
-                        else:
-                            try:
-                                # Validate max_results
-                                if not isinstance(max_results, int) or max_results < 1 or max_results > 20:
-                                    max_results = 10
-
-                                result = get_most_expensive_sold_weekly(appid, max_results)
-                                resp = {
-                                    "jsonrpc": "2.0",
-                                    "id": id_,
-                                    "result": {
-                                        "content": [
-                                            {
-                                                "type": "text",
-                                                "text": json.dumps(result, indent=2, ensure_ascii=False)
-                                            }
-                                        ]
-                                    }
-                                }
-                            except Exception as e:
-                                logging.error(f"Tool execution error: {e}")
-                                resp = {
-                                    "jsonrpc": "2.0",
-                                    "id": id_,
-                                    "error": {
-                                        "code": -32603,
-                                        "message": f"Tool execution failed: {str(e)}"
-                                    }
-                                }
+                        ]
+                    }
+                }
 
-                    else:
-                        resp = {
-                            "jsonrpc": "2.0",
-                            "id": id_,
-                            "error": {
-                                "code": -32601,
-                                "message": f"Tool not found: {tool_name}. Available tools: get_steam_item_data, search_steam_items, get_popular_items_24h, get_most_expensive_sold_24h, get_most_expensive_sold_weekly"
+        elif tool_name == "crawl_market_catalog":
+            appid = arguments.get("appid")
+            mode = arguments.get("mode", "auto")
+
+            if not appid or mode not in ("auto", "full", "incremental"):
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "error": {
+                        "code": -32602,
+                        "message": "Invalid params: appid is required and mode must be auto, full or incremental"
+                    }
+                }
+            else:
+                result = crawl_market_catalog(appid, mode)
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "result": {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": render_result(result)
                             }
+                        ]
+                    }
+                }
+
+        elif tool_name == "get_server_metrics":
+            resp = {
+                "jsonrpc": "2.0",
+                "id": id_,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": render_result(get_server_metrics())
                         }
-                else:
+                    ]
+                }
+            }
+
+        elif tool_name == "get_most_expensive_sold_weekly":
+            appid = arguments.get("appid")
+            max_results = arguments.get("max_results", 10)
+
+            if not appid:
+                resp = {
+                    "jsonrpc": "2.0",
+                    "id": id_,
+                    "error": {
+                        "code": -32602,
+                        "message": "Invalid params: appid is required"
+                    }
+                }
+            else:
+                try:
+                    # Validate max_results
+                    if not isinstance(max_results, int) or max_results < 1 or max_results > 20:
+                        max_results = 10
+
+                    result = get_most_expensive_sold_weekly(appid, max_results, arguments.get("allow_stale"))
+                    resp = {
+                        "jsonrpc": "2.0",
+                        "id": id_,
+                        "result": {
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": render_result(result)
+                                }
+                            ]
+                        }
+                    }
+                except Exception as e:
+                    logging.error(f"Tool execution error: {e}")
                     resp = {
                         "jsonrpc": "2.0",
                         "id": id_,
                         "error": {
-                            "code": -32601,
-                            "message": f"Method not found: {method}"
+                            "code": -32603,
+                            "message": f"Tool execution failed: {str(e)}"
                         }
                     }
 
-                # Log response for debugging
-                response_str = json.dumps(resp)
-                logging.info(f"Sending response: {response_str[:100]}...")
+        else:
+            resp = {
+                "jsonrpc": "2.0",
+                "id": id_,
+                "error": {
+                    "code": -32601,
+                    "message": f"Tool not found: {tool_name}. Available tools: get_steam_item_data, get_steam_items_bulk, search_steam_items, get_popular_items_24h, get_most_expensive_sold_24h, get_most_expensive_sold_weekly, crawl_market_catalog, get_server_metrics"
+                }
+            }
+    else:
+        resp = {
+            "jsonrpc": "2.0",
+            "id": id_,
+            "error": {
+                "code": -32601,
+                "message": f"Method not found: {method}"
+            }
+        }
+
+    return resp
+
+_active_requests = {}
+_active_requests_lock = threading.Lock()
+_stdout_lock = threading.Lock()
 
-                sys.stdout.write(response_str + "\n")
-                sys.stdout.flush()
+def write_message(message):
+    """Write one line-delimited JSON-RPC message to stdout
+
+    The envelope is ASCII-escaped so it can be written whatever stdout's
+    encoding; the tool result text inside it was already encoded by dumps().
+    """
+    line = json.dumps(message, separators=(",", ":"), default=str)
+    logging.info(f"Sending message: {line[:100]}...")
+    with _stdout_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+def cancel_request(request_id):
+    """Mark an in-flight request as cancelled so its workers stop early"""
+    with _active_requests_lock:
+        ctx = _active_requests.get(request_id)
+    if ctx is not None:
+        ctx.cancelled.set()
+
+def register_request(req):
+    """Create the RequestContext of a tools/call and make it cancellable from now on"""
+    meta = req.get("params", {}).get("_meta") or {}
+    ctx = RequestContext(req.get("id"), meta.get("progressToken"), bool(meta.get("compact", COMPACT_JSON)))
+    tool_name = req.get("params", {}).get("name")
+    if meta.get("profile", "all" in PROFILE_TOOLS or tool_name in PROFILE_TOOLS):
+        ctx.profiler = CallProfiler()
+    with _active_requests_lock:
+        _active_requests[ctx.request_id] = ctx
+    return ctx
+
+def serve_request(req, ctx=None):
+    """Serve one request on a dispatcher thread and write its response when done
+
+    ctx is the context registered when the request was queued; a request
+    cancelled while still queued is dropped without running.
+    """
+    id_ = req.get("id")
+    tool_name = req.get("params", {}).get("name")
+    if ctx is None:
+        ctx = register_request(req)
+    if ctx.cancelled.is_set():
+        with _active_requests_lock:
+            _active_requests.pop(id_, None)
+        return
+    token = _current_request.set(ctx)
+    # The whole call is the parent span of its stage spans in the trace
+    span = Span(str(tool_name), "tool")
+    try:
+        with span:
+            resp = handle_request(req) if ctx.profiler is None else ctx.profiler.run(handle_request, req)
+    except Exception as e:
+        logging.error(f"Request {id_} failed: {e}")
+        resp = {
+            "jsonrpc": "2.0",
+            "id": id_,
+            "error": {
+                "code": -32603,
+                "message": f"Tool execution failed: {str(e)}"
+            }
+        }
+    finally:
+        _current_request.reset(token)
+        with _active_requests_lock:
+            _active_requests.pop(id_, None)
+
+    try:
+        if ctx.profiler is not None:
+            try:
+                ctx.response_meta["profile"] = dict(ctx.profiler.write(profile_path(tool_name, id_)), total_ms=round(span.duration * 1000, 2))
+            except Exception as e:
+                logging.error(f"Writing profile for request {id_} failed: {e}")
+                ctx.response_meta["profile"] = {"error": str(e)}
+
+        if ctx.response_meta and "result" in resp:
+            resp["result"]["_meta"] = ctx.response_meta
+
+        # Unknown tool names share one label so they cannot grow the registry
+        tool = "unknown" if resp.get("error", {}).get("code") == -32601 else tool_name
+        outcome = "cancelled" if ctx.cancelled.is_set() else "error" if "error" in resp else "ok"
+        _metrics.observe("steam_mcp_tool_seconds", span.duration, tool=tool)
+        _metrics.inc("steam_mcp_tool_calls_total", tool=tool, outcome=outcome)
+        if _tracer is not None:
+            _tracer.flush()
+
+        # Cancelled requests get no response, as required by the MCP cancellation spec
+        if not ctx.cancelled.is_set():
+            write_message(resp)
+    except Exception as e:
+        # Nothing watches the dispatcher future, so the client must hear about the failure here or it waits forever
+        logging.exception(f"Sending the response to request {id_} failed: {e}")
+        if not ctx.cancelled.is_set():
+            write_message({
+                "jsonrpc": "2.0",
+                "id": id_,
+                "error": {
+                    "code": -32603,
+                    "message": f"Internal error while sending the response: {str(e)}"
+                }
+            })
+
+def main():
+    """Main MCP server loop with enhanced Smithery compatibility
+
+    Tool calls run concurrently on a dispatcher pool and their responses are
+    written as they finish; lightweight methods are answered inline.
+    """
+    dispatcher = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="mcp-request")
+    prewarm = None
+    try:
+        # Ensure stdout is flushed immediately for Smithery compatibility
+        sys.stdout.reconfigure(line_buffering=True)
+        sys.stderr.reconfigure(line_buffering=True)
+
+        # Send ready signal for Smithery
+        sys.stderr.write("MCP Server starting...\n")
+        sys.stderr.flush()
+
+        _cache.disk_cache = open_disk_cache()
+        start_cache_janitor()
+        start_metrics_writer()
+        prewarm = start_prewarm()
+
+        for line in sys.stdin:
+            try:
+                line = line.strip()
+                if not line:
+                    continue
+
+                # Log incoming request for debugging
+                logging.info(f"Received request: {line[:100]}...")
+
+                req = json.loads(line)
+                method = req.get("method")
+
+                if method == "notifications/cancelled":
+                    cancel_request(req.get("params", {}).get("requestId"))
+                elif isinstance(method, str) and method.startswith("notifications/"):
+                    # Notifications never get a response
+                    continue
+                elif method == "tools/call":
+                    # Registered before queueing so a call still waiting for a dispatcher thread can be cancelled
+                    dispatcher.submit(serve_request, req, register_request(req))
+                else:
+                    write_message(handle_request(req))
 
             except json.JSONDecodeError as e:
                 error_resp = {
@@ -1396,8 +3921,7 @@ def main():
                         "message": f"Parse error: {str(e)}"
                     }
                 }
-                sys.stdout.write(json.dumps(error_resp) + "\n")
-                sys.stdout.flush()
+                write_message(error_resp)
 
     except KeyboardInterrupt:
         pass
@@ -1410,8 +3934,35 @@ def main():
                 "message": f"Internal error: {str(e)}"
             }
         }
-        sys.stdout.write(json.dumps(error_resp) + "\n")
-        sys.stdout.flush()
+        write_message(error_resp)
+    finally:
+        # stdin closed or server interrupted: let in-flight calls answer, then release pooled connections
+        dispatcher.shutdown(wait=True)
+        if prewarm is not None:
+            prewarm.stop()
+            prewarm_stats = prewarm.stats()
+            sys.stderr.write(f"Prewarm stats: {prewarm_stats['runs']} refreshes, {prewarm_stats['failures']} failures\n")
+        close_http_client()
+        for name, stats in _strategy_stats.stats().items():
+            sys.stderr.write(
+                f"Listing strategy {name}: {stats['successes']}/{stats['attempts']} ok, "
+                f"{stats['avg_ms']} ms and {stats['avg_bytes']} bytes per attempt\n"
+            )
+        cache_stats = _cache.stats()
+        sys.stderr.write(
+            f"Result cache stats: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+            f"{cache_stats['evictions']} evictions, {cache_stats['expirations']} expirations\n"
+        )
+        sys.stderr.flush()
+        if _tracer is not None:
+            _tracer.close()
+        if METRICS_FILE:
+            try:
+                write_metrics_file()
+            except OSError as e:
+                logging.error(f"Writing metrics to {METRICS_FILE} failed: {e}")
+        if _cache.disk_cache is not None:
+            _cache.disk_cache.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
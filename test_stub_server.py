@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Test the Steam MCP server against a local stub of the Steam Community endpoints
+"""
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.parse
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOGIN_COOKIE = "stub-login"
+CATALOG_SIZE = 250
+
+def price_history(points=48):
+    """Hourly price history ending now, in Steam's [label, price, volume] format"""
+    now = datetime.utcnow()
+    return [
+        [(now - timedelta(hours=points - i)).strftime("%b %d %Y %H: +0"), 10.0 + i * 0.1, str(i + 1)]
+        for i in range(points)
+    ]
+
+def listing_page(item_name):
+    return f"""<html><head><script type="text/javascript">
+    var line1={json.dumps(price_history())};
+</script></head><body>
+<div class="market_listing_item_name_block"><span class="market_listing_item_name">{item_name}</span></div>
+<span class="market_listing_price market_listing_price_with_fee">$12.50</span>
+<span id="searchResults_total">42</span>
+</body></html>"""
+
+class StubSteamHandler(BaseHTTPRequestHandler):
+    """Serves priceoverview, pricehistory, search/render and listing pages; unknown items are 'no longer available'"""
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        item_name = query.get("market_hash_name", [""])[0]
+        self.server.paths.append(url.path)
+
+        if url.path == "/market/priceoverview/":
+            if item_name == "Missing Item":
+                self.send_body(500, "application/json", json.dumps({"success": False}))
+            else:
+                overview = {"success": True, "lowest_price": "$12.34", "volume": "1,234", "median_price": "$12.00"}
+                self.send_body(200, "application/json", json.dumps(overview))
+        elif url.path == "/market/pricehistory/":
+            if f"steamLoginSecure={LOGIN_COOKIE}" in self.headers.get("Cookie", ""):
+                self.send_body(200, "application/json", json.dumps({"success": True, "price_prefix": "$", "prices": price_history()}))
+            else:
+                self.send_body(400, "application/json", "[]")
+        elif url.path == "/market/search/render/":
+            start = int(query.get("start", ["0"])[0])
+            count = int(query.get("count", ["10"])[0])
+            results = [
+                {"name": f"Item {i:03d}", "hash_name": f"Item {i:03d}", "sell_listings": i + 1, "sell_price_text": f"${i + 1}.00"}
+                for i in range(start, min(start + count, CATALOG_SIZE))
+            ]
+            self.send_body(200, "application/json", json.dumps({"success": True, "start": start, "total_count": CATALOG_SIZE, "results": results}))
+        elif url.path.startswith("/market/listings/"):
+            item_name = urllib.parse.unquote(url.path.rsplit("/", 1)[1])
+            if item_name == "Missing Item":
+                self.send_body(200, "text/html", '<div id="message">This item is no longer available on the market.</div>')
+            else:
+                self.send_body(200, "text/html", listing_page(item_name))
+        else:
+            self.send_body(404, "text/plain", "not found")
+
+    def send_body(self, status, content_type, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub():
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubSteamHandler)
+    stub.paths = []
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    return stub
+
+def run_server(stub, requests, **env):
+    """Run server.py against the stub, send requests and return every message it wrote to stdout"""
+    env = {**os.environ, "STEAM_MCP_COMMUNITY_URL": f"http://127.0.0.1:{stub.server_port}", **env}
+    env.pop("STEAM_MCP_DISK_CACHE", None)
+    process = subprocess.run(
+        [sys.executable, "server.py"],
+        input="".join(json.dumps(request) + "\n" for request in requests),
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env=env
+    )
+    return [json.loads(line) for line in process.stdout.splitlines()]
+
+def call_tools(stub, calls, **env):
+    """Send one tools/call per (name, arguments) and return the parsed results"""
+    requests = [
+        {"jsonrpc": "2.0", "id": i, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+        for i, (name, arguments) in enumerate(calls, 1)
+    ]
+    responses = {
+        message["id"]: json.loads(message["result"]["content"][0]["text"])
+        for message in run_server(stub, requests, **env) if "id" in message
+    }
+    return [responses[i] for i in range(1, len(calls) + 1)]
+
+def test_json_fast_path():
+    """With a login cookie, price and history come from the JSON endpoints and the page is never fetched"""
+    stub = start_stub()
+    try:
+        result, missing = call_tools(
+            stub,
+            [
+                ("get_steam_item_data", {"appid": "730", "item_name": "AK-47 | Redline (Field-Tested)"}),
+                ("get_steam_item_data", {"appid": "730", "item_name": "Missing Item"})
+            ],
+            STEAM_MCP_LOGIN_SECURE=LOGIN_COOKIE
+        )
+    finally:
+        stub.shutdown()
+
+    assert result["current_price"] == "$12.34"
+    assert result["data_points"] == 10
+    assert result["status"] == "success"
+    assert "/market/listings/730/AK-47%20%7C%20Redline%20%28Field-Tested%29" not in stub.paths
+    # Unknown items fall back to the listing page, which reports them as gone
+    assert "no longer available" in missing["error"]
+    assert any(path.startswith("/market/listings/730/Missing") for path in stub.paths)
+
+def test_html_fallback_without_login():
+    """Without a login cookie the history is unavailable from JSON, so the listing page is used"""
+    stub = start_stub()
+    try:
+        (result,) = call_tools(
+            stub,
+            [("get_steam_item_data", {"appid": "730", "item_name": "AK-47 | Redline (Field-Tested)"})],
+            STEAM_MCP_LOGIN_SECURE=""
+        )
+    finally:
+        stub.shutdown()
+
+    assert result["current_price"] == "$12.50"
+    assert result["data_points"] == 10
+    assert "/market/pricehistory/" not in stub.paths
+    assert any(path.startswith("/market/listings/730/") for path in stub.paths)
+
+def test_catalog_crawl():
+    """A full crawl pages through every search/render offset and persists the catalog"""
+    stub = start_stub()
+    with tempfile.TemporaryDirectory() as directory:
+        catalog_path = os.path.join(directory, "catalog.json")
+        try:
+            (result,) = call_tools(stub, [("crawl_market_catalog", {"appid": "730", "mode": "full"})], STEAM_MCP_CATALOG_PATH=catalog_path)
+        finally:
+            stub.shutdown()
+
+        assert result["status"] == "success"
+        assert result["items"] == CATALOG_SIZE
+        assert result["complete"] is True
+        assert stub.paths.count("/market/search/render/") == 3
+        with open(catalog_path, encoding="utf-8") as f:
+            items = json.load(f)["appids"]["730"]["items"]
+        assert items["Item 041"] == {"price": "$42.00", "quantity": 42, "seen_at": items["Item 041"]["seen_at"]}
+
+def test_server_metrics():
+    """Tool latencies, HTTP statuses and parse times are reported by get_server_metrics and the Prometheus file"""
+    stub = start_stub()
+    with tempfile.TemporaryDirectory() as directory:
+        metrics_path = os.path.join(directory, "metrics.prom")
+        try:
+            _, metrics = call_tools(
+                stub,
+                [
+                    ("get_steam_item_data", {"appid": "730", "item_name": "AK-47 | Redline (Field-Tested)"}),
+                    ("get_server_metrics", {})
+                ],
+                STEAM_MCP_LOGIN_SECURE="",
+                STEAM_MCP_MAX_CONCURRENT_REQUESTS="1",
+                STEAM_MCP_METRICS_FILE=metrics_path
+            )
+        finally:
+            stub.shutdown()
+
+        assert metrics["tools"]["get_steam_item_data"]["count"] == 1
+        assert metrics["tools"]["get_steam_item_data"]["outcomes"] == {"ok": 1}
+        assert metrics["http"]["listing"]["statuses"] == {"200": 1}
+        assert metrics["parse"]["price_history"]["count"] == 1
+        assert metrics["cache"]["listings"]["misses"] >= 1
+        with open(metrics_path, encoding="utf-8") as f:
+            text = f.read()
+        assert 'steam_mcp_tool_calls_total{outcome="ok",tool="get_server_metrics"} 1' in text
+        assert 'steam_mcp_http_request_seconds_count{endpoint="listing"} 1' in text
+
+def test_trace_file():
+    """Every stage of a tool call is written to the trace file as a complete event tagged with the request id"""
+    stub = start_stub()
+    with tempfile.TemporaryDirectory() as directory:
+        trace_path = os.path.join(directory, "trace.json")
+        try:
+            call_tools(
+                stub,
+                [("get_steam_item_data", {"appid": "730", "item_name": "AK-47 | Redline (Field-Tested)"})],
+                STEAM_MCP_LOGIN_SECURE="",
+                STEAM_MCP_TRACE_FILE=trace_path
+            )
+        finally:
+            stub.shutdown()
+
+        with open(trace_path, encoding="utf-8") as f:
+            text = f.read()
+        # The trace event format allows the closing bracket to be missing
+        events = json.loads(text.rstrip().rstrip(",") + "]")
+        assert {event["cat"] for event in events} == {"tool", "ratelimit", "fetch", "parse", "history", "serialize"}
+        assert all(event["ph"] == "X" and event["args"]["request_id"] == 1 for event in events)
+
+def test_profile_file():
+    """A profiled tool call leaves a cProfile dump named by tool and request id"""
+    stub = start_stub()
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            call_tools(
+                stub,
+                [("get_steam_item_data", {"appid": "730", "item_name": "AK-47 | Redline (Field-Tested)"})],
+                STEAM_MCP_LOGIN_SECURE="",
+                STEAM_MCP_PROFILE="get_steam_item_data",
+                STEAM_MCP_PROFILE_DIR=directory
+            )
+        finally:
+            stub.shutdown()
+
+        stats = pstats.Stats(os.path.join(directory, "get_steam_item_data-1.prof"))
+        assert any(function == "fetch_item_data" for _, _, function in stats.stats)
+
+def test_non_ascii_names_on_non_utf8_stdout():
+    """Responses are ASCII-escaped, so a non-UTF-8 console encoding still gets every response"""
+    stub = start_stub()
+    try:
+        (result,) = call_tools(
+            stub,
+            [("get_steam_item_data", {"appid": "730", "item_name": "\u2605 Karambit | Fade (Factory New)"})],
+            STEAM_MCP_LOGIN_SECURE="",
+            PYTHONIOENCODING="cp1252"
+        )
+    finally:
+        stub.shutdown()
+
+    assert result["item_name"] == "\u2605 Karambit | Fade (Factory New)"
+    assert result["current_price"] == "$12.50"
+
+def test_progress_notifications():
+    """Progress goes only to calls that sent a progressToken, carries that token and never goes backwards"""
+    items = [{"appid": "730", "item_name": f"Item {i:03d}"} for i in range(6)]
+    requests = [
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+         "params": {"name": "get_steam_items_bulk", "arguments": {"items": items}, "_meta": {"progressToken": "bulk"}}},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/call",
+         "params": {"name": "get_most_expensive_sold_24h", "arguments": {"appid": "730", "max_results": 3}, "_meta": {"progressToken": 7}}},
+        {"jsonrpc": "2.0", "id": 3, "method": "tools/call",
+         "params": {"name": "get_steam_items_bulk", "arguments": {"items": items[:2] + [{"appid": "730", "item_name": "Item 100"}]}}}
+    ]
+    stub = start_stub()
+    try:
+        messages = run_server(stub, requests, STEAM_MCP_LOGIN_SECURE="", STEAM_MCP_REQUESTS_PER_SECOND="50", STEAM_MCP_RATE_BURST="20")
+    finally:
+        stub.shutdown()
+
+    assert sorted(message["id"] for message in messages if "id" in message) == [1, 2, 3]
+    notifications = [message["params"] for message in messages if message.get("method") == "notifications/progress"]
+    by_token = {}
+    for params in notifications:
+        by_token.setdefault(params["progressToken"], []).append(params)
+    assert set(by_token) == {"bulk", 7}
+
+    for token, updates in by_token.items():
+        progress = [update["progress"] for update in updates]
+        assert progress == sorted(progress) and len(set(progress)) == len(progress), (token, progress)
+        assert all(update["progress"] <= update["total"] for update in updates)
+    assert by_token["bulk"][-1]["progress"] == by_token["bulk"][-1]["total"] == len(items)
+    assert len(by_token[7][-1]["_meta"]["partial_results"]) <= 3
+
+if __name__ == "__main__":
+    test_json_fast_path()
+    test_html_fallback_without_login()
+    test_catalog_crawl()
+    test_server_metrics()
+    test_trace_file()
+    test_profile_file()
+    test_non_ascii_names_on_non_utf8_stdout()
+    test_progress_notifications()
+    print("✓ Stub server tests passed")
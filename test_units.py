@@ -0,0 +1,782 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Steam MCP server internals; no network access needed
+"""
+import os
+import tempfile
+import threading
+import time
+
+import server
+
+def start_request(request_id, fn, *args):
+    """Run fn(*args) on its own thread as the request request_id; returns (context, thread, outcome)"""
+    ctx = server.RequestContext(request_id)
+    outcome = {}
+
+    def target():
+        server._current_request.set(ctx)
+        try:
+            outcome["result"] = fn(*args)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return ctx, thread, outcome
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+def fake_listing(appid, item_name, market_url=None, refresh=False, fields=server.LISTING_FIELDS):
+    """A slow listing fetch with one sale in the last hour"""
+    time.sleep(0.05)
+    listing = server.new_listing(appid, item_name, market_url or server.listing_url(appid, item_name), 200, "html")
+    listing["current_price"] = "$100.00"
+    label = time.strftime("%b %d %Y %H: +0", time.gmtime(time.time() - 3600))
+    listing["history"] = server.PriceHistory.from_entries([[label, 99.5, "3"]])
+    return listing
+
+def test_fetch_items_concurrently_bounds_workers_and_keeps_order():
+    """Items overlap up to max_workers at a time; results keep input order and failed items are dropped"""
+    active, peak, reported = [0], [0], []
+    lock = threading.Lock()
+
+    def worker(item):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        if item == 3:
+            raise ValueError("bad page")
+        return None if item == 5 else item * 10
+
+    started = time.perf_counter()
+    results = server.fetch_items_concurrently(list(range(12)), worker, max_workers=4, on_result=lambda done, result: reported.append(done))
+    elapsed = time.perf_counter() - started
+
+    assert results == [0, 10, 20, 40, 60, 70, 80, 90, 100, 110]
+    assert peak[0] == 4
+    # Three rounds of four, not twelve sequential fetches
+    assert elapsed < 12 * 0.05
+    assert reported == list(range(1, 13))
+
+def test_cancelled_scan_leader_does_not_fail_waiters():
+    """When the request leading a shared scan is cancelled, a waiting request still gets a real result"""
+    original_cache, original_get_listing = server._cache, server.get_listing
+    server._cache = server.ResultCache()
+    server.get_listing = fake_listing
+    try:
+        cache_key = server.get_cache_key("get_most_expensive_sold_24h", "730", max_results=3)
+        leader, leader_thread, _ = start_request(1, server.get_most_expensive_sold_24h, "730", 3)
+        wait_until(lambda: server._tool_flights.running(cache_key))
+        _, waiter_thread, waiter = start_request(2, server.get_most_expensive_sold_24h, "730", 3)
+        time.sleep(0.1)
+        leader.cancelled.set()
+        leader_thread.join(10)
+        waiter_thread.join(10)
+    finally:
+        server._cache, server.get_listing = original_cache, original_get_listing
+
+    assert waiter["result"].data["status"] == "success"
+    assert waiter["result"].data["total_found"] == 3
+
+def test_request_cancelled_while_queued_never_runs():
+    """A tools/call cancelled before a dispatcher thread picks it up is dropped without running"""
+    handled, written = [], []
+    original_handle, original_write = server.handle_request, server.write_message
+    server.handle_request = lambda req: handled.append(req) or {"jsonrpc": "2.0", "id": req["id"], "result": {}}
+    server.write_message = written.append
+    try:
+        req = {"jsonrpc": "2.0", "id": 7, "method": "tools/call", "params": {"name": "get_steam_item_data", "arguments": {}}}
+        ctx = server.register_request(req)
+        server.cancel_request(7)
+        server.serve_request(req, ctx)
+    finally:
+        server.handle_request, server.write_message = original_handle, original_write
+
+    assert handled == [] and written == []
+    assert 7 not in server._active_requests
+
+def test_failed_response_write_sends_error():
+    """A response that cannot be written is replaced by a JSON-RPC error for the same id"""
+    written = []
+    original_handle, original_write = server.handle_request, server.write_message
+    server.handle_request = lambda req: {"jsonrpc": "2.0", "id": req["id"], "result": {"content": [{"type": "text", "text": object()}]}}
+
+    def write(message):
+        if "result" in message:
+            raise TypeError("result is not serializable")
+        written.append(message)
+
+    server.write_message = write
+    try:
+        req = {"jsonrpc": "2.0", "id": 8, "method": "tools/call", "params": {"name": "get_steam_item_data", "arguments": {}}}
+        server.serve_request(req)
+    finally:
+        server.handle_request, server.write_message = original_handle, original_write
+
+    assert len(written) == 1
+    assert written[0]["id"] == 8 and written[0]["error"]["code"] == -32603
+    assert 8 not in server._active_requests
+
+def test_circuit_breaker_half_open_lets_one_trial_through():
+    """After the pause exactly one caller may try; its success closes the circuit and its failure reopens it"""
+    breaker = server.CircuitBreaker(failure_threshold=2, reset_after=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow() and not breaker.available()
+
+    time.sleep(0.06)
+    assert breaker.available()
+    assert breaker.allow()
+    # Other threads are refused while the trial is in flight
+    _, thread, outcome = start_request(None, breaker.allow)
+    thread.join()
+    assert outcome["result"] is False and not breaker.available()
+
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+def test_circuit_breaker_released_trial_frees_the_slot():
+    """A trial that ends without a verdict lets the next caller try"""
+    breaker = server.CircuitBreaker(failure_threshold=1, reset_after=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.available()
+    breaker.release()
+    assert breaker.available()
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.body, self.status_code = body, status_code
+        self.content = server.json.dumps(body).encode()
+
+    def json(self):
+        return self.body
+
+def test_json_strategy_treats_non_object_bodies_as_failures():
+    """A list or null body from the JSON endpoints falls back to the page and counts against the breaker"""
+    bodies = []
+    client = type("Client", (), {"get": lambda self, url, **kwargs: FakeResponse(bodies.pop(0))})()
+    original = server.get_http_client, server._price_api_breaker, server.STEAM_LOGIN_SECURE
+    server.get_http_client = lambda: client
+    server._price_api_breaker = breaker = server.CircuitBreaker()
+    server.STEAM_LOGIN_SECURE = "cookie"
+    try:
+        bodies[:] = [[]]
+        assert server.fetch_listing_json("730", "AK-47 | Redline (Field-Tested)") == (None, 2)
+        bodies[:] = [{"success": True, "lowest_price": "$10.00", "volume": "5"}, None]
+        assert server.fetch_listing_json("730", "AK-47 | Redline (Field-Tested)")[0] is None
+        # An unsuccessful object is an unknown item, not an endpoint failure
+        bodies[:] = [{"success": False}]
+        assert server.fetch_listing_json("730", "Missing Item")[0] is None
+    finally:
+        server.get_http_client, server._price_api_breaker, server.STEAM_LOGIN_SECURE = original
+
+    assert breaker.failures == 2
+
+def test_token_bucket_aimd_backoff_and_recovery():
+    """429s halve the rate down to the floor; successes add it back in small steps up to the budget"""
+    bucket = server.TokenBucket(4.0, capacity=1, min_rate=0.5, increase=0.5)
+    bucket.on_throttled()
+    assert bucket.rate == 2.0
+    for _ in range(5):
+        bucket.on_throttled()
+    assert bucket.rate == 0.5
+    assert bucket.stats()["throttled"] == 6
+
+    bucket.on_success()
+    assert bucket.rate == 1.0
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.rate == 4.0
+
+def test_token_bucket_paces_after_burst():
+    """The burst is served at once, then each token costs 1/rate seconds"""
+    bucket = server.TokenBucket(10.0, capacity=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert 0.09 < bucket.reserve() <= 0.1
+
+def test_token_bucket_retry_after_blocks():
+    """Retry-After blocks the bucket and no tokens accrue during the block"""
+    bucket = server.TokenBucket(100.0, capacity=5)
+    bucket.on_throttled(retry_after=0.5)
+    wait = bucket.reserve()
+    assert 0.49 < wait <= 0.52
+
+def test_token_bucket_cancel_returns_token():
+    """A cancelled wait raises RequestCancelled and hands its token back"""
+    bucket = server.TokenBucket(1.0, capacity=1)
+    bucket.reserve()
+    cancelled = threading.Event()
+    cancelled.set()
+    tokens = bucket.tokens
+    try:
+        bucket.acquire(cancelled)
+        assert False, "acquire should have been cancelled"
+    except server.RequestCancelled:
+        pass
+    assert abs(bucket.tokens - tokens) < 0.01
+
+def test_rate_limiter_buckets_and_responses():
+    """Buckets are kept per host and endpoint class; only 429 slows a bucket, 5xx leaves it alone"""
+    limiter = server.RateLimiter({"listing": 2.0, "search": 1.0, "default": 1.0})
+    listing_url = "https://steamcommunity.com/market/listings/730/AK-47"
+    search_url = "https://steamcommunity.com/market/search/render/"
+    assert limiter.bucket_for(listing_url) is limiter.bucket_for("https://steamcommunity.com/market/listings/440/Key")
+    assert limiter.bucket_for(listing_url) is not limiter.bucket_for(search_url)
+    assert limiter.bucket_for(search_url).rate == 1.0
+
+    limiter.record_response(listing_url, 500)
+    assert limiter.bucket_for(listing_url).rate == 2.0
+    limiter.record_response(listing_url, 429, "2")
+    bucket = limiter.bucket_for(listing_url)
+    assert bucket.rate == 1.0
+    assert bucket.blocked_until > time.monotonic() + 1.9
+    assert limiter.stats()["steamcommunity.com/listing"]["throttled"] == 1
+
+def test_parse_retry_after():
+    assert server.parse_retry_after("3") == 3.0
+    assert server.parse_retry_after(None) is None
+    assert server.parse_retry_after("soon") is None
+    later = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 60))
+    assert 55 < server.parse_retry_after(later) <= 60
+
+def test_result_cache_lru_eviction():
+    """The least recently used entry goes first when the entry cap is exceeded"""
+    cache = server.ResultCache(max_entries=2, ttls={"default": 60})
+    cache.set("tool|a", {"v": 1})
+    cache.set("tool|b", {"v": 2})
+    assert cache.get("tool|a") == {"v": 1}
+    cache.set("tool|c", {"v": 3})
+    assert cache.get("tool|b") is None
+    assert cache.get("tool|a") == {"v": 1} and cache.get("tool|c") == {"v": 3}
+    assert cache.stats()["evictions"] == 1
+
+def test_result_cache_byte_cap():
+    """Entries are evicted to stay within max_bytes, and a single oversized entry is never kept"""
+    cache = server.ResultCache(max_entries=100, max_bytes=250, ttls={"default": 60})
+    for key in "abc":
+        cache.set(f"tool|{key}", {"v": key}, size=100)
+    assert cache.get("tool|a") is None
+    assert cache.stats()["bytes"] == 200
+    cache.set("tool|huge", {"v": 0}, size=1000)
+    assert cache.get("tool|huge") is None
+    assert cache.stats()["entries"] == 2
+
+def test_result_cache_ttl_per_tool():
+    """TTLs are chosen by the tool name that starts the key, and expired entries are misses"""
+    cache = server.ResultCache(ttls={"short": 0.05, "default": 60})
+    cache.set("short|730", {"v": 1})
+    cache.set("long|730", {"v": 2})
+    assert cache.get("short|730") == {"v": 1}
+    time.sleep(0.06)
+    assert cache.get("short|730") is None
+    assert cache.get("long|730") == {"v": 2}
+    assert cache.stats()["expirations"] == 1
+
+    cache.set("long|440", {"v": 3}, ttl=0)
+    cache.purge_expired()
+    assert cache.stats()["entries"] == 1
+
+def test_result_cache_staleness_bound():
+    """An expired entry is a miss but stays servable stale until its tool's staleness bound"""
+    cache = server.ResultCache(ttls={"default": 0.05}, max_stale={"tool": 0.1, "default": 0})
+    cache.set("tool|730", {"v": 1})
+    cache.set("other|730", {"v": 2})
+    assert cache.get_stale("tool|730") is None
+    time.sleep(0.06)
+
+    assert cache.get("tool|730") is None
+    entry, age = cache.get_stale("tool|730")
+    assert entry["data"] == {"v": 1} and age >= 0.05
+    # Tools without a staleness allowance are gone as soon as they expire
+    assert cache.get_stale("other|730") is None
+
+    time.sleep(0.1)
+    assert cache.get_stale("tool|730") is None
+    assert cache.get("tool|730") is None
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["stale_hits"] == 1
+
+def test_disk_cache_evicts_least_recently_used_past_its_size_cap():
+    """Writes past max_bytes drop the least recently read entries first"""
+    with tempfile.TemporaryDirectory() as directory:
+        disk = server.DiskCache(os.path.join(directory, "cache.sqlite3"), max_bytes=250)
+        try:
+            now = time.time()
+            for key in ("a", "b"):
+                disk.set(key, server.json.dumps("x" * 100), now, now + 60)
+            assert disk.get("a") is not None
+            disk.set("c", server.json.dumps("x" * 100), now, now + 60)
+            assert disk.get("b") is None
+            assert disk.get("a") is not None and disk.get("c") is not None
+            stats = disk.stats()
+        finally:
+            disk.close()
+
+    assert stats["entries"] == 2 and stats["bytes"] <= 250
+    assert stats["evictions"] == 1 and stats["hits"] == 3 and stats["misses"] == 1
+
+def test_disk_cache_expires_entries():
+    """Entries past their expiry are neither served nor kept"""
+    with tempfile.TemporaryDirectory() as directory:
+        disk = server.DiskCache(os.path.join(directory, "cache.sqlite3"))
+        try:
+            now = time.time()
+            disk.set("old", server.json.dumps({"a": 1}), now - 10, now - 1)
+            assert disk.get("old") is None
+            disk.set("new", server.json.dumps({"a": 2}), now, now + 60)
+            assert disk.get("new") == ({"a": 2}, now, now + 60)
+            assert disk.stats()["entries"] == 1
+        finally:
+            disk.close()
+
+def test_disk_cache_entries_are_promoted_after_a_restart():
+    """A new process answers from disk once, then from memory, with the original expiry"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        before = server.ResultCache(disk_cache=server.DiskCache(path))
+        before.set("get_popular_items_24h|730", {"items": [1, 2]}, ttl=60)
+        stored, _ = before.get_entry("get_popular_items_24h|730")
+        before.disk_cache.close()
+
+        after = server.ResultCache(disk_cache=server.DiskCache(path))
+        try:
+            first, first_tier = after.get_entry("get_popular_items_24h|730")
+            second, second_tier = after.get_entry("get_popular_items_24h|730")
+            disk_stats = after.disk_cache.stats()
+        finally:
+            after.disk_cache.close()
+
+    assert (first_tier, second_tier) == ("disk", "memory")
+    assert second["data"] == {"items": (1, 2)} and second["expires_at"] == stored["expires_at"]
+    assert disk_stats["hits"] == 1
+
+def test_cache_hits_serve_frozen_data_with_per_response_metadata():
+    """Repeated hits return the stored result unchanged; hit details go in _meta, never into the entry"""
+    written = []
+    original_cache, original_write = server._cache, server.write_message
+    server._cache = server.ResultCache()
+    server.write_message = written.append
+    try:
+        cache_key = server.get_cache_key("get_popular_items_24h", "730", max_results=10)
+        server._cache.set(cache_key, {"popular_items": [{"name": "AK-47 | Redline (Field-Tested)"}], "note": "scan", "status": "success"})
+        for id_ in (1, 2):
+            req = {"jsonrpc": "2.0", "id": id_, "method": "tools/call", "params": {"name": "get_popular_items_24h", "arguments": {"appid": "730"}}}
+            server.serve_request(req)
+        entry, _ = server._cache.get_entry(cache_key)
+    finally:
+        server._cache, server.write_message = original_cache, original_write
+
+    first, second = written
+    assert first["result"]["content"] == second["result"]["content"]
+    assert server.json.loads(second["result"]["content"][0]["text"])["note"] == "scan"
+    assert second["result"]["_meta"]["cache"]["hit"] is True
+    assert second["result"]["_meta"]["cache"]["source"] == "memory"
+    assert entry["data"]["note"] == "scan" and "_meta" not in entry["data"]
+    for mutate in (lambda: entry["data"].update(note="changed"), lambda: entry["data"]["popular_items"][0].pop("name")):
+        try:
+            mutate()
+        except (TypeError, AttributeError):
+            pass
+        else:
+            raise AssertionError("cached data was mutable")
+
+def test_weekly_ranking_reuses_listings_fetched_by_the_24h_ranking():
+    """Items both rankings check are fetched once; the second ranking only fetches the rest"""
+    fetched = []
+
+    def fetch(appid, item_name, market_url=None, fields=server.LISTING_FIELDS):
+        fetched.append(item_name)
+        listing = fake_listing(appid, item_name, market_url)
+        listing["quantity_available"] = "5"
+        return listing
+
+    original = server._cache, server._listing_cache, server.fetch_listing
+    server._cache = server.ResultCache()
+    server._listing_cache = server.ResultCache(ttls={"default": 60})
+    server.fetch_listing = fetch
+    try:
+        server.get_most_expensive_sold_24h("730", 5)
+        daily = set(fetched)
+        fetched.clear()
+        server.get_most_expensive_sold_weekly("730", 5)
+    finally:
+        server._cache, server._listing_cache, server.fetch_listing = original
+
+    weekly_items = set(server.ULTRA_EXPENSIVE_ITEMS_DB["730"])
+    assert daily == set(server.EXPENSIVE_ITEMS_DB["730"]) and daily & weekly_items
+    assert sorted(fetched) == sorted(weekly_items - daily)
+
+def test_cached_scan_serves_stale_and_refreshes_once():
+    """allow_stale answers from the expired entry at once and starts a single background rescan"""
+    scans = []
+
+    def scan(appid, max_results, cache_key):
+        scans.append(cache_key)
+        time.sleep(0.1)
+        result = {"appid": appid, "note": "fresh", "status": "success"}
+        # The first result expires almost at once, the refreshed one stays fresh
+        server._cache.set(cache_key, result, ttl=0.05 if len(scans) == 1 else 60)
+        return result
+
+    original_cache = server._cache
+    server._cache = server.ResultCache(max_stale={"default": 60})
+    try:
+        miss = server.cached_scan("tool", "730", 5, scan)
+        time.sleep(0.06)
+        first = server.cached_scan("tool", "730", 5, scan, allow_stale=True)
+        second = server.cached_scan("tool", "730", 5, scan, allow_stale=True)
+        wait_until(lambda: server._cache.get(server.get_cache_key("tool", "730", max_results=5)) is not None)
+        fresh = server.cached_scan("tool", "730", 5, scan)
+    finally:
+        server._cache = original_cache
+
+    # Every path returns the same type, so callers render them alike
+    assert all(isinstance(r, server.CachedResult) for r in (miss, first, second, fresh))
+    assert first.data["stale"] is True and second.data["stale"] is True
+    assert "stale result" in first.data["note"]
+    assert '"stale": true' in first.text("pretty")
+    assert len(scans) == 2
+    assert fresh.data["note"] == "fresh" and "stale" not in fresh.data
+
+def test_prewarm_schedule_charges_scans_against_the_budget():
+    """Listing and scan jobs together stay within the prewarm share of the request rate"""
+    original_rate = server.REQUESTS_PER_SECOND
+    server.REQUESTS_PER_SECOND = 0.5
+    try:
+        scheduler = server.PrewarmScheduler(["730", "440"])
+        heap = scheduler.schedule(0)
+    finally:
+        server.REQUESTS_PER_SECOND = original_rate
+
+    periods = {name: period for due, seq, period, name, job in heap}
+    rate = sum(1 / period for name, period in periods.items() if name.startswith("listing "))
+    for tool_name in ("get_popular_items_24h", "get_most_expensive_sold_24h", "get_most_expensive_sold_weekly"):
+        rate += scheduler.scan_requests(tool_name) / periods[f"{tool_name} 730"]
+    assert rate <= 0.5 * server.PREWARM_BUDGET_SHARE + 1e-9
+    # The scans alone would not fit, so their periods are stretched past their TTLs too
+    assert periods["get_popular_items_24h 730"] > server._cache.ttl_for("get_popular_items_24h")
+
+def test_single_flight_shares_one_execution():
+    """Concurrent callers with the same key share one run and its result; the key is free again afterwards"""
+    flights = server.SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def work():
+        runs.append(1)
+        release.wait(5)
+        return {"v": len(runs)}
+
+    calls = [start_request(i, flights.do, "key", work) for i in range(5)]
+    wait_until(lambda: flights.stats()["shared"] == 4)
+    release.set()
+    for _, thread, _ in calls:
+        thread.join(5)
+
+    assert runs == [1]
+    assert all(outcome["result"] == {"v": 1} for _, _, outcome in calls)
+    assert not flights.running("key")
+    assert flights.do("key", lambda: "again") == "again"
+
+def test_single_flight_shares_errors():
+    """Waiters receive the leader's exception"""
+    flights = server.SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("boom")
+
+    calls = [start_request(i, flights.do, "key", fail) for i in range(2)]
+    wait_until(lambda: flights.stats()["shared"] == 1)
+    release.set()
+    for _, thread, _ in calls:
+        thread.join(5)
+    assert all(isinstance(outcome["error"], ValueError) for _, _, outcome in calls)
+
+def test_single_flight_waiter_cancel_and_leader_cancel_retry():
+    """A cancelled waiter stops waiting; when the leader is cancelled a waiter runs the work itself"""
+    flights = server.SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def work():
+        runs.append(server.current_request().request_id)
+        while not release.wait(0.01):
+            server.check_cancelled()
+        return "done"
+
+    leader, leader_thread, leader_outcome = start_request(1, flights.do, "key", work)
+    wait_until(lambda: flights.running("key"))
+    waiter, waiter_thread, waiter_outcome = start_request(2, flights.do, "key", work)
+    other, other_thread, other_outcome = start_request(3, flights.do, "key", work)
+    wait_until(lambda: flights.stats()["shared"] == 2)
+
+    other.cancelled.set()
+    other_thread.join(5)
+    assert isinstance(other_outcome["error"], server.RequestCancelled)
+
+    leader.cancelled.set()
+    leader_thread.join(5)
+    assert isinstance(leader_outcome["error"], server.RequestCancelled)
+    wait_until(lambda: runs == [1, 2])
+    release.set()
+    waiter_thread.join(5)
+    assert waiter_outcome["result"] == "done"
+
+def hourly_history(hours, now):
+    """History with one point per hour ending at now: the price is 10 + hours back, the volume 1"""
+    entries = [
+        [time.strftime("%b %d %Y %H: +0", time.gmtime(now - back * 3600)), 10.0 + back, "1"]
+        for back in range(hours, 0, -1)
+    ]
+    return server.PriceHistory.from_entries(entries)
+
+def test_price_history_since_and_window():
+    """since and window resolve time ranges to index ranges with the start inclusive and the end exclusive"""
+    now = 1734220800  # Dec 15 2024 00:00 UTC, on the hour
+    history = hourly_history(48, now)
+    assert len(history) == 48
+
+    start = history.since(server.DAY_SECONDS, now=now)
+    assert history.volume_sum(start) == 24
+    assert history.timestamps[start] == now - server.DAY_SECONDS
+    assert history.since(0, now=now) == 48
+    assert history.since(10 * server.DAY_SECONDS, now=now) == 0
+
+    start, end = history.window(now - 10 * 3600, now - 5 * 3600)
+    assert end - start == 5
+    assert history.max_price(start, end) == 20.0
+    assert history.mean_price(start, end) == 18.0
+    assert history.window(now + 3600) == (48, 48)
+
+def test_price_history_parsing_and_aggregates():
+    """Malformed entries are skipped, out-of-order points sorted, and unpriced points ignored by price aggregates"""
+    history = server.PriceHistory.from_entries([
+        ["Dec 15 2024 02: +0", "$3.00", "1,000"],
+        ["Dec 15 2024 01: +0", 0, "5"],
+        ["not a date", 1.0, "1"],
+        ["Dec 15 2024 03: +0"],
+        ["Dec 15 2024 00: +0", 1.0, "3"]
+    ])
+    assert [entry[0] for entry in history.entries()] == ["Dec 15 2024 00: +0", "Dec 15 2024 01: +0", "Dec 15 2024 02: +0"]
+    stats = history.window_stats()
+    assert stats == {"points": 3, "priced_points": 2, "volume": 1008, "max_price": 3.0, "mean_price": 2.0, "vwap": 3003 / 1008}
+    assert history.entries(history.last(1)) == [["Dec 15 2024 02: +0", 3.0, "1000"]]
+    assert server.PriceHistory().window_stats()["vwap"] == 0.0
+
+CATALOG_ROWS = [
+    {"name": "AK-47 | Redline (Field-Tested)", "price": "$12.00", "quantity_available": "1,500", "market_url": ""},
+    {"name": "AK-47 | Redline (Minimal Wear)", "price": "$30.00", "quantity_available": "200", "market_url": ""},
+    {"name": "AK-47 | Vulcan (Field-Tested)", "price": "$90.00", "quantity_available": "80", "market_url": ""},
+    {"name": "\u2605 Karambit | Fade (Factory New)", "price": "$1,900.00", "quantity_available": "12", "market_url": ""}
+]
+
+def test_catalog_search_prefix_coverage():
+    """A query extending one whose every match was returned is answered locally; anything else goes to Steam"""
+    catalog = server.MarketCatalog()
+    assert catalog.search("730", "AK-47", 10) is None
+
+    ak_rows = CATALOG_ROWS[:3]
+    catalog.record_search("730", "AK", ak_rows, total_count=3)
+    result = catalog.search("730", "ak-47 red", 10)
+    assert result["source"] == "local_index"
+    assert [row["name"] for row in result["results"]] == ["AK-47 | Redline (Field-Tested)", "AK-47 | Redline (Minimal Wear)"]
+    assert result["results"][0]["quantity_available"] == "1,500"
+    assert catalog.search("730", "ak-47", 1)["total_results"] == 3
+
+    # Other queries, and truncated result sets, give no coverage
+    assert catalog.search("730", "Karambit", 10) is None
+    catalog.record_search("730", "M4", CATALOG_ROWS[:1], total_count=50)
+    assert catalog.search("730", "M4A4", 10) is None
+    assert catalog.search("440", "ak-47 red", 10) is None
+
+def test_catalog_search_after_full_crawl():
+    """A recent complete crawl makes every query for the appid local"""
+    catalog = server.MarketCatalog()
+    catalog.merge("730", CATALOG_ROWS)
+    assert catalog.search("730", "karambit", 10) is None
+    state = catalog.appids["730"]
+    state["complete"], state["crawled_at"] = True, time.time()
+    result = catalog.search("730", "karambit", 10)
+    assert [row["name"] for row in result["results"]] == ["\u2605 Karambit | Fade (Factory New)"]
+    assert catalog.search("730", "nothing like this", 10)["total_results"] == 0
+
+    state["crawled_at"] = time.time() - server.CATALOG_FULL_RECRAWL_SECONDS - 1
+    assert catalog.search("730", "karambit", 10) is None
+
+def test_name_index_rebuild_keeps_serving_the_old_index():
+    """Lookups made while a rebuild is reading its names still see the old index"""
+    index = server.ItemNameIndex()
+    index.add("730", ["AK-47 | Redline (Field-Tested)", "AWP | Asiimov (Field-Tested)"])
+    seen_during_rebuild = []
+
+    def names():
+        yield "AK-47 | Redline (Field-Tested)"
+        seen_during_rebuild.append(index.lookup("730", "awp | asiimov (field-tested)"))
+        yield "M4A4 | Howl (Factory New)"
+
+    index.rebuild("730", names())
+    assert seen_during_rebuild == ["AWP | Asiimov (Field-Tested)"]
+    assert index.lookup("730", "awp | asiimov (field-tested)") is None
+    assert index.search("730", "m4a4") == {"M4A4 | Howl (Factory New)"}
+    assert index.vocab["730"] == sorted(index.vocab["730"])
+
+def test_full_crawl_with_short_pages_stays_incomplete():
+    """Every page fetched is not enough; the crawl must also have seen the items Steam counts"""
+    catalog = server.MarketCatalog()
+    pages = {0: CATALOG_ROWS[:2], 100: CATALOG_ROWS[2:3]}
+    catalog.fetch_page = lambda appid, start: (pages[start], 200)
+    summary = catalog.crawl("730", "full")
+    assert summary["complete"] is False and summary["items"] == 3
+    assert catalog.appids["730"]["crawl"] is None
+
+    catalog.fetch_page = lambda appid, start: (CATALOG_ROWS, len(CATALOG_ROWS))
+    assert catalog.crawl("730", "auto")["complete"] is True
+    assert catalog.covers("730")
+
+def test_resolve_item_name_corrects_known_names():
+    """Near-exact names are corrected; unknown names are fetched as given, even after a complete crawl"""
+    original_catalog = server._catalog
+    server._catalog = catalog = server.MarketCatalog()
+    try:
+        catalog.merge("730", CATALOG_ROWS)
+        assert server.resolve_item_name("730", "AK-47 | Vulcan (Field-Tested)") == ("AK-47 | Vulcan (Field-Tested)", None)
+
+        name, resolution = server.resolve_item_name("730", "karambit |  fade (factory new)")
+        assert name == "\u2605 Karambit | Fade (Factory New)"
+        assert resolution == {"status": "corrected", "requested_name": "karambit |  fade (factory new)", "resolved_name": name}
+
+        assert server.resolve_item_name("730", "AK-47 | Redlin (Field-Tested)") == ("AK-47 | Redlin (Field-Tested)", None)
+        state = catalog.appids["730"]
+        state["complete"], state["crawled_at"] = True, time.time()
+        assert server.resolve_item_name("730", "AK-47 | Redlin (Field-Tested)") == ("AK-47 | Redlin (Field-Tested)", None)
+
+        suggestions = server.name_suggestions("730", "AK-47 | Redlin (Field-Tested)")
+        assert suggestions[0]["name"] == "AK-47 | Redline (Field-Tested)"
+        assert all(suggestion["name"].startswith("AK-47") for suggestion in suggestions)
+    finally:
+        server._catalog = original_catalog
+
+def test_bulk_results_have_one_shape_for_hits_and_fetches():
+    """Cache hits get the same name resolution and suggestions as fetched items"""
+    fetched = []
+
+    def fetch(appid, item_name, market_url=None, fields=server.LISTING_FIELDS):
+        fetched.append(item_name)
+        listing = fake_listing(appid, item_name)
+        listing["not_found"] = item_name == "AK-47 | Redlin (Field-Tested)"
+        return listing
+
+    original = server._catalog, server._listing_cache, server.fetch_listing
+    server._catalog = catalog = server.MarketCatalog()
+    server._listing_cache = server.ResultCache(ttls={"default": 60})
+    server.fetch_listing = fetch
+    try:
+        catalog.merge("730", CATALOG_ROWS)
+        server.get_listing("730", "\u2605 Karambit | Fade (Factory New)", fields=server.ITEM_DATA_FIELDS)
+        server.get_listing("730", "AK-47 | Redlin (Field-Tested)", fields=server.ITEM_DATA_FIELDS)
+        fetched.clear()
+        bulk = server.get_steam_items_bulk([
+            {"appid": "730", "item_name": "karambit | fade (factory new)"},  # corrected, cached
+            {"appid": "730", "item_name": "\u2605 Karambit | Fade (Factory New)"},  # same item, cached
+            {"appid": "730", "item_name": "AK-47 | Redlin (Field-Tested)"},  # cached not-found
+            {"appid": "730", "item_name": "ak-47 | vulcan (field-tested)"},  # corrected, fetched
+            {"appid": "730"}  # invalid
+        ])
+    finally:
+        server._catalog, server._listing_cache, server.fetch_listing = original
+
+    corrected_hit, exact_hit, not_found, corrected_fetch, invalid = bulk["results"]
+    assert fetched == ["AK-47 | Vulcan (Field-Tested)"]
+    assert bulk["cache_hits"] == 2 and bulk["fetched"] == 1 and bulk["unique_items"] == 3
+    assert corrected_hit["name_resolution"]["resolved_name"] == "\u2605 Karambit | Fade (Factory New)"
+    assert "name_resolution" not in exact_hit and exact_hit["current_price"] == corrected_hit["current_price"]
+    assert not_found["suggestions"][0]["name"] == "AK-47 | Redline (Field-Tested)"
+    assert corrected_fetch["name_resolution"]["resolved_name"] == "AK-47 | Vulcan (Field-Tested)"
+    assert corrected_fetch["status"] == "success"
+    assert "error" in invalid and bulk["errors"] == 2
+
+def test_index_miss_is_fetched_and_not_found_is_cached():
+    """A name missing from a complete catalog is fetched once; a not-found answer is then served from cache"""
+    fetched = []
+
+    def fetch(appid, item_name, market_url=None, fields=server.LISTING_FIELDS):
+        fetched.append(item_name)
+        listing = server.new_listing(appid, item_name, server.listing_url(appid, item_name), 200, "html")
+        listing["not_found"] = item_name != "AK-47 | Redline (Factory New)"
+        return listing
+
+    original = server._catalog, server._listing_cache, server.fetch_listing
+    server._catalog = catalog = server.MarketCatalog()
+    server._listing_cache = server.ResultCache(ttls={"default": 60})
+    server.fetch_listing = fetch
+    try:
+        catalog.merge("730", CATALOG_ROWS)
+        state = catalog.appids["730"]
+        state["complete"], state["crawled_at"] = True, time.time()
+
+        # Listed after the crawl: the index misses it but the fetch finds it
+        assert server.get_listing("730", "AK-47 | Redline (Factory New)")["not_found"] is False
+        assert server.get_listing("730", "Gone Item")["not_found"] is True
+        assert server.get_listing("730", "Gone Item")["not_found"] is True
+        entry, _ = server._listing_cache.get_entry(server.listing_cache_key("730", "Gone Item"))
+    finally:
+        server._catalog, server._listing_cache, server.fetch_listing = original
+
+    assert fetched == ["AK-47 | Redline (Factory New)", "Gone Item"]
+    assert entry["expires_at"] - entry["stored_at"] == server.NOT_FOUND_TTL
+
+if __name__ == "__main__":
+    test_fetch_items_concurrently_bounds_workers_and_keeps_order()
+    test_cancelled_scan_leader_does_not_fail_waiters()
+    test_single_flight_shares_one_execution()
+    test_prewarm_schedule_charges_scans_against_the_budget()
+    test_single_flight_shares_errors()
+    test_single_flight_waiter_cancel_and_leader_cancel_retry()
+    test_request_cancelled_while_queued_never_runs()
+    test_failed_response_write_sends_error()
+    test_circuit_breaker_half_open_lets_one_trial_through()
+    test_circuit_breaker_released_trial_frees_the_slot()
+    test_json_strategy_treats_non_object_bodies_as_failures()
+    test_token_bucket_aimd_backoff_and_recovery()
+    test_token_bucket_paces_after_burst()
+    test_token_bucket_retry_after_blocks()
+    test_token_bucket_cancel_returns_token()
+    test_rate_limiter_buckets_and_responses()
+    test_parse_retry_after()
+    test_price_history_since_and_window()
+    test_price_history_parsing_and_aggregates()
+    test_catalog_search_prefix_coverage()
+    test_catalog_search_after_full_crawl()
+    test_name_index_rebuild_keeps_serving_the_old_index()
+    test_full_crawl_with_short_pages_stays_incomplete()
+    test_resolve_item_name_corrects_known_names()
+    test_index_miss_is_fetched_and_not_found_is_cached()
+    test_bulk_results_have_one_shape_for_hits_and_fetches()
+    test_result_cache_lru_eviction()
+    test_result_cache_byte_cap()
+    test_result_cache_ttl_per_tool()
+    test_result_cache_staleness_bound()
+    test_disk_cache_evicts_least_recently_used_past_its_size_cap()
+    test_disk_cache_expires_entries()
+    test_disk_cache_entries_are_promoted_after_a_restart()
+    test_cache_hits_serve_frozen_data_with_per_response_metadata()
+    test_weekly_ranking_reuses_listings_fetched_by_the_24h_ranking()
+    test_cached_scan_serves_stale_and_refreshes_once()
+    print("✓ Unit tests passed")